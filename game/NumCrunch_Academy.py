@@ -1,20 +1,39 @@
+import os
 import pygame
-import random
 import sys
 from pathlib import Path
 
-# Initialize pygame
-pygame.init()
-pygame.mixer.pre_init(frequency=22050, size=-16, channels=2, buffer=512)
-pygame.mixer.init()
+if __package__ in (None, ''):
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from game import core
+from game.core import GRID_SIZE, GameState
+from game.text_cache import render_text, text_cache
+from game.layers import GridLayer, solid_overlay
+from game.camera import Camera
+from game.dirty_rects import DirtyRectRenderer, dirty_rects_enabled
+from game.display import ScaledDisplay, display_options
+from game.asset_cache import load_image
+from game.manifest import asset_digest, asset_file
+from game.async_assets import AsyncAssetLoader
+from game.sound_bank import SoundBank, init_mixer
+from game.pacing import FramePacer, adaptive_pacing_enabled, pacing_report_enabled
+from game.profiler import profiler, profiling_enabled, OVERLAY_SIZE
+from game.classroom import connect
+from game.mastery import load_profile, state_scheduler, student_name
+from game.scores import RANGES, mode_name, open_scores, range_start
+from game.replay import new_seed, start_recording
+from game.telemetry import start_telemetry
 
 # Game constants
-WIDTH, HEIGHT = 800, 600
-GRID_SIZE = 5
+WIDTH, HEIGHT = 800, 600  # logical size; the window can be any size
 CELL_SIZE = 80
-GRID_OFFSET_X = (WIDTH - GRID_SIZE * CELL_SIZE) // 2
-GRID_OFFSET_Y = (HEIGHT - GRID_SIZE * CELL_SIZE) // 2
-ENEMY_SPEED = 1500
+VIEW_SIZE = GRID_SIZE  # cells shown across; bigger boards scroll with the player
+GRID_OFFSET_X = (WIDTH - VIEW_SIZE * CELL_SIZE) // 2
+GRID_OFFSET_Y = (HEIGHT - VIEW_SIZE * CELL_SIZE) // 2
+PROFILE_KEY = pygame.K_F3  # toggle the profiling overlay
+TRACE_KEY = pygame.K_F4  # dump a profile trace
+LEADERBOARD_KEY = pygame.K_TAB  # top scores, then the next date range
+NETWORK_EVENT = pygame.event.custom_type()  # wakes the loop when a classroom tick arrives
 
 # Colors
 WHITE = (255, 255, 255, 128)
@@ -23,261 +42,432 @@ GREEN = (0, 255, 0)
 RED = (255, 0, 0)
 BLUE = (0, 0, 255)
 GRAY = (200, 200, 200)
+FEEDBACK_COLORS = {'correct': GREEN, 'wrong': RED}
 
-# Setup display
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("NumCrunch Academy")
-clock = pygame.time.Clock()
+# Game sound name -> logical name in the asset manifest
+SOUND_ASSETS = {
+    'hurt': 'hurt',
+    'click': 'click',
+    'correct': 'correct',
+    'munch': 'crunch',
+    'victory': 'victory'
+}
 
-# Fonts
-font = pygame.font.SysFont('Arial', 32)
-small_font = pygame.font.SysFont('Arial', 24)
-title_font = pygame.font.SysFont('Arial', 48)
+KEY_ACTIONS = {
+    pygame.K_LEFT: core.LEFT,
+    pygame.K_RIGHT: core.RIGHT,
+    pygame.K_UP: core.UP,
+    pygame.K_DOWN: core.DOWN,
+}
 
-def load_assets():
+# Display resources, created by init_display()
+display = None
+screen = None
+pacer = None
+renderer = None
+font = None
+small_font = None
+title_font = None
+debug_font = None
+assets = None
+sound_bank = None
+loader = None
+grid_layer = None
+camera = None
+music_playing = False  # between EVENT_START and EVENT_GAME_OVER
+
+def game_options(grid_size=GRID_SIZE):
+    """GameState options for a ``grid_size`` board in this window"""
+    return core.board_options(grid_size, VIEW_SIZE)
+
+def init_display(grid_size=GRID_SIZE, window_size=None):
+    global camera, display, screen, pacer, renderer, font, small_font, title_font, debug_font, assets, sound_bank, loader, grid_layer, music_playing
+    init_mixer()
+    pygame.init()
+    sound_bank = SoundBank()
+
+    size, fullscreen, smooth = display_options((WIDTH, HEIGHT))
+    display = ScaledDisplay((WIDTH, HEIGHT), window_size or size, fullscreen, smooth)
+    screen = display.surface
+    pygame.display.set_caption("NumCrunch Academy")
+    pacer = FramePacer(adaptive=adaptive_pacing_enabled())  # NUMCRUNCH_PACING=fixed
+    renderer = DirtyRectRenderer(screen, enabled=dirty_rects_enabled(), output=display)
+
+    font = pygame.font.SysFont('Arial', 32)
+    small_font = pygame.font.SysFont('Arial', 24)
+    title_font = pygame.font.SysFont('Arial', 48)
+    debug_font = pygame.font.SysFont('Arial', 14)
+
+    loader = AsyncAssetLoader()
+    music_playing = False
+    assets = load_assets(loader)
+    camera = Camera(grid_size, VIEW_SIZE)
+    grid_layer = GridLayer(font, camera.view_size, CELL_SIZE, (GRID_OFFSET_X, GRID_OFFSET_Y),
+                           WHITE, BLACK, BLACK, highlight_color=GREEN)
+
+    profiler.watch('surfaces', lambda: text_cache.misses + grid_layer.rebuilds)
+    profiler.hit_rate('text', lambda: text_cache.hits, lambda: text_cache.misses)
+    profiler.hit_rate('grid', lambda: grid_layer.hits, lambda: grid_layer.rebuilds)
+    profiler.watch('sounds', lambda: sound_bank.stats['played'])
+    profiler.watch('sound skips', lambda: sound_bank.stats['cooldown'] + sound_bank.stats['voice_limit'])
+    profiler.watch('voices cut', lambda: sound_bank.stats['stolen'])
+    profiler.watch('underruns', lambda: sound_bank.stats['stalls'])
+    if profiling_enabled() and not profiler.enabled:
+        profiler.toggle()
+
+def image_size(img_name):
+    return (WIDTH, HEIGHT) if img_name == 'background' else (CELL_SIZE, CELL_SIZE)
+
+def placeholder_image(img_name):
+    if img_name == 'player': color = BLUE
+    elif img_name == 'enemy': color = RED
+    else: color = GRAY
+    surf = pygame.Surface(image_size(img_name), pygame.SRCALPHA)
+    surf.fill(color)
+    return surf
+
+def load_sound(asset_name, volume):
+    with asset_file(asset_name) as path:
+        sound = pygame.mixer.Sound(path)
+    sound.set_volume(volume)
+    return sound
+
+def load_music():
+    with asset_file('music') as music_path:
+        pygame.mixer.music.load(music_path)
+    pygame.mixer.music.set_volume(0.4)
+    return True
+
+def load_sprite(img_name):
+    with asset_file(img_name) as path:
+        return load_image(path, image_size(img_name), digest=asset_digest(img_name, path))
+
+def load_assets(loader):
+    """Start decoding assets on the loader's threads.
+
+    The returned dict holds placeholder images until loader.poll() swaps
+    the real ones in; sounds go to sound_bank as they finish.
+    """
     assets = {
-        'images': {},
-        'sounds': {
-            'hurt': None,
-            'click': None,
-            'correct': None,
-            'munch': None,
-            'victory': None
-        },
+        'images': {img_name: placeholder_image(img_name)
+                   for img_name in ['player', 'enemy', 'background']},
         'music': None
     }
-    base_path = Path(__file__).parent
     
-    # Load sounds
-    sound_files = {
-        'hurt': '386893__samueleunimancer__ouch-screem.wav',
-        'click': 'click.wav',
-        'correct': 'correct.wav',
-        'munch': 'munch.wav',
-        'victory': 'victory.flac'
-    }
+    for sound_name, asset_name in SOUND_ASSETS.items():
+        if sound_name == 'hurt': volume = 0.8
+        elif sound_name in ['victory', 'correct']: volume = 1.0
+        else: volume = 0.7
+        loader.submit(load_sound, lambda sound, name=asset_name: sound_bank.add(name, sound),
+                      asset_name, volume)
     
-    for sound_name, filename in sound_files.items():
-        try:
-            path = base_path / 'assets' / 'sounds' / filename
-            assets['sounds'][sound_name] = pygame.mixer.Sound(path)
-            if sound_name == 'hurt': assets['sounds'][sound_name].set_volume(0.8)
-            elif sound_name in ['victory', 'correct']: assets['sounds'][sound_name].set_volume(1.0)
-            else: assets['sounds'][sound_name].set_volume(0.7)
-        except: pass
+    loader.submit(load_music, music_loaded)
     
-    # Load music
-    try:
-        music_path = base_path / 'assets' / 'sounds' / 'background.wav'
-        pygame.mixer.music.load(music_path)
-        pygame.mixer.music.set_volume(0.4)
-        assets['music'] = True
-    except: pass
-    
-    # Load images
     for img_name in ['player', 'enemy', 'background']:
-        try:
-            path = base_path / 'assets' / 'images' / f'{img_name}.png'
-            img = pygame.image.load(path).convert_alpha()
-            assets['images'][img_name] = pygame.transform.scale(
-                img, (WIDTH, HEIGHT) if img_name == 'background' else (CELL_SIZE, CELL_SIZE))
-        except:
-            if img_name == 'player': color = BLUE
-            elif img_name == 'enemy': color = RED
-            else: color = GRAY
-            size = (WIDTH, HEIGHT) if img_name == 'background' else (CELL_SIZE, CELL_SIZE)
-            surf = pygame.Surface(size, pygame.SRCALPHA)
-            surf.fill(color)
-            assets['images'][img_name] = surf
+        loader.submit(load_sprite, lambda surf, name=img_name: assets['images'].update({name: surf}),
+                      img_name)
     
     return assets
 
-assets = load_assets()
-
-# Game variables
-player_pos = [GRID_SIZE // 2, GRID_SIZE // 2]
-enemy_pos = [0, 0]
-grid_values = []
-current_problem = ""
-correct_answer = 0
-score = 0
-lives = 3
-game_active = False
-feedback_text = ""
-feedback_time = 0
-last_enemy_move = 0
-
-def generate_problem():
-    b = random.randint(2, 12)
-    answer = random.randint(2, 12)
-    return f"{b * answer} ÷ {b} = ?", answer
-
-def generate_grid():
-    global grid_values, current_problem, correct_answer
-    grid_values = []
-    current_problem, correct_answer = generate_problem()
-    empty_positions = [(r, c) for r in range(GRID_SIZE) for c in range(GRID_SIZE)
-                      if not (r == player_pos[1] and c == player_pos[0])
-                      and not (r == enemy_pos[1] and c == enemy_pos[0])]
-    
-    correct_row, correct_col = random.choice(empty_positions)
-    for i in range(GRID_SIZE * GRID_SIZE):
-        if i == correct_row * GRID_SIZE + correct_col:
-            grid_values.append(correct_answer)
+def music_loaded(loaded):
+    """Keep the music and start it if a game began while it was loading"""
+    assets['music'] = loaded
+    if loaded and music_playing:
+        pygame.mixer.music.play(-1)
+
+def play_events(events):
+    """Play the sounds and music changes for events returned by core.step"""
+    global music_playing
+    for event in events:
+        if event == core.EVENT_START:
+            music_playing = True
+            if assets['music']: pygame.mixer.music.play(-1)
+        elif event == core.EVENT_GAME_OVER:
+            music_playing = False
+            pygame.mixer.music.stop()
+            sound_bank.play('victory')
+        elif event in SOUND_ASSETS:
+            sound_bank.play(SOUND_ASSETS[event])
+
+def draw_grid(state):
+    # Background and grid are baked together; rebuilt only when the grid changes
+    # Only the cells in view are baked, so text rendering doesn't grow with the board
+    screen.blit(grid_layer.get(assets['images']['background'], camera.visible_values(state.grid_values),
+                               state.correct_answer, screen.get_size()), (0, 0))
+
+def cell_rect(pos):
+    """Screen rect of board cell ``pos`` (which should be in view)"""
+    x, y = camera.to_view(pos)
+    return (GRID_OFFSET_X + x * CELL_SIZE, GRID_OFFSET_Y + y * CELL_SIZE, CELL_SIZE, CELL_SIZE)
+
+def track_regions(state, now, board=None, standing=None):
+    if board is not None and not state.active:
+        renderer.track('screen', screen.get_rect(), ('leaderboard', board[0], board[1].done()))
+        return
+    mode = 'playing' if state.active else ('game_over' if state.game_over else 'menu')
+    renderer.track('screen', screen.get_rect(),
+                   (mode, state.score if mode == 'game_over' else loader.progress))
+    if not state.active:
+        return
+    grid_rect = (GRID_OFFSET_X, GRID_OFFSET_Y, camera.view_size * CELL_SIZE, camera.view_size * CELL_SIZE)
+    renderer.track('grid', grid_rect,
+                   (camera.origin, tuple(camera.visible_values(state.grid_values)), state.correct_answer))
+    renderer.track('player', cell_rect(state.player_pos), tuple(state.player_pos))
+    for i, pos in enumerate(state.enemies):
+        # An enemy leaving or entering the view redraws the grid area
+        if camera.contains(pos):
+            renderer.track(f'enemy{i}', cell_rect(pos), tuple(pos))
         else:
-            wrong = correct_answer + random.randint(-5, 5)
-            while wrong == correct_answer or wrong <= 0:
-                wrong = correct_answer + random.randint(-5, 5)
-            grid_values.append(wrong)
-
-def move_enemy():
-    global enemy_pos, lives, last_enemy_move, player_pos
-    possible_moves = []
-    if enemy_pos[0] < player_pos[0]: possible_moves.append((1, 0))
-    elif enemy_pos[0] > player_pos[0]: possible_moves.append((-1, 0))
-    if enemy_pos[1] < player_pos[1]: possible_moves.append((0, 1))
-    elif enemy_pos[1] > player_pos[1]: possible_moves.append((0, -1))
-    
-    if possible_moves:
-        dx, dy = random.choice(possible_moves)
-        new_x, new_y = enemy_pos[0] + dx, enemy_pos[1] + dy
-        if 0 <= new_x < GRID_SIZE and 0 <= new_y < GRID_SIZE:
-            enemy_pos = [new_x, new_y]
-    
-    if enemy_pos == player_pos:
-        lives -= 1
-        show_feedback("OUCH! -1 Life", RED)
-        if assets['sounds']['hurt']: assets['sounds']['hurt'].play()
-        player_pos = [GRID_SIZE // 2, GRID_SIZE // 2]
-        if lives <= 0: end_game()
-
-def show_feedback(message, color):
-    global feedback_text, feedback_time
-    feedback_text = (message, color)
-    feedback_time = pygame.time.get_ticks() + 1000
-
-def end_game():
-    global game_active
-    game_active = False
-    pygame.mixer.music.stop()
-    if assets['sounds']['victory']: assets['sounds']['victory'].play()
-
-def start_game():
-    global player_pos, enemy_pos, score, lives, game_active, last_enemy_move
-    player_pos = [GRID_SIZE // 2, GRID_SIZE // 2]
-    enemy_pos = [0, 0]
-    score = 0
-    lives = 3
-    game_active = True
-    last_enemy_move = pygame.time.get_ticks()
-    generate_grid()
-    if assets['music']: pygame.mixer.music.play(-1)
-
-def draw_grid():
-    for row in range(GRID_SIZE):
-        for col in range(GRID_SIZE):
-            x = GRID_OFFSET_X + col * CELL_SIZE
-            y = GRID_OFFSET_Y + row * CELL_SIZE
-            cell = pygame.Surface((CELL_SIZE, CELL_SIZE), pygame.SRCALPHA)
-            cell.fill(WHITE)
-            screen.blit(cell, (x, y))
-            pygame.draw.rect(screen, BLACK, (x, y, CELL_SIZE, CELL_SIZE), 2)
-            value = grid_values[row * GRID_SIZE + col]
-            color = GREEN if value == correct_answer else BLACK
-            num_text = font.render(str(value), True, color)
-            screen.blit(num_text, (x + CELL_SIZE//2 - num_text.get_width()//2, 
-                             y + CELL_SIZE//2 - num_text.get_height()//2))
-
-def draw_entities():
-    player_x = GRID_OFFSET_X + player_pos[0] * CELL_SIZE
-    player_y = GRID_OFFSET_Y + player_pos[1] * CELL_SIZE
-    enemy_x = GRID_OFFSET_X + enemy_pos[0] * CELL_SIZE
-    enemy_y = GRID_OFFSET_Y + enemy_pos[1] * CELL_SIZE
-    screen.blit(assets['images']['player'], (player_x, player_y))
-    screen.blit(assets['images']['enemy'], (enemy_x, enemy_y))
-
-def draw_ui():
-    screen.blit(small_font.render(f"Score: {score}", True, BLACK), (20, 20))
-    screen.blit(small_font.render(f"Lives: {lives}", True, BLACK), (20, 50))
-    screen.blit(font.render(current_problem, True, BLACK), 
-               (WIDTH//2 - font.size(current_problem)[0]//2, 20))
-    if pygame.time.get_ticks() < feedback_time:
-        msg, color = feedback_text
-        feedback = font.render(msg, True, color)
+            renderer.track(f'enemy{i}', grid_rect, None)
+    renderer.track('hud', (0, 0, WIDTH, 80), (state.score, state.lives, state.current_problem, standing))
+    renderer.track('feedback', (0, HEIGHT - 60, WIDTH, 60),
+                   state.feedback if state.feedback_visible(now) else None)
+
+def draw_entities(state):
+    screen.blit(assets['images']['player'], cell_rect(state.player_pos))
+    for pos in state.enemies:
+        if camera.contains(pos):
+            screen.blit(assets['images']['enemy'], cell_rect(pos))
+
+def draw_centered(text_font, text, color, y):
+    text_surf = render_text(text_font, text, color)
+    screen.blit(text_surf, (WIDTH//2 - text_surf.get_width()//2, y))
+
+def draw_ui(state, now, standing=None):
+    screen.blit(render_text(small_font, f"Score: {state.score}", BLACK), (20, 20))
+    screen.blit(render_text(small_font, f"Lives: {state.lives}", BLACK), (20, 50))
+    if standing is not None:
+        rank_text = render_text(small_font, f"Class: {standing[0]} of {standing[1]}", BLACK)
+        screen.blit(rank_text, (WIDTH - 20 - rank_text.get_width(), 20))
+    draw_centered(font, state.current_problem, BLACK, 20)
+    if state.feedback_visible(now):
+        msg, kind = state.feedback
+        feedback = render_text(font, msg, FEEDBACK_COLORS[kind])
         screen.blit(feedback, (WIDTH//2 - feedback.get_width()//2, HEIGHT - 50))
 
-def draw_menu():
+def draw_menu(scores_enabled):
     screen.blit(assets['images']['background'], (0, 0))
-    screen.blit(title_font.render("NumCrunch Academy", True, BLUE), 
-               (WIDTH//2 - title_font.size("NumCrunch Academy")[0]//2, HEIGHT//3))
-    screen.blit(font.render("Solve math problems to score points", True, BLACK),
-               (WIDTH//2 - font.size("Solve math problems to score points")[0]//2, HEIGHT//2))
-    screen.blit(font.render("Press any key to Start", True, GREEN),
-               (WIDTH//2 - font.size("Press any key to Start")[0]//2, HEIGHT*2//3))
-
-def draw_game_over():
+    draw_centered(title_font, "NumCrunch Academy", BLUE, HEIGHT//3)
+    draw_centered(font, "Solve math problems to score points", BLACK, HEIGHT//2)
+    draw_centered(font, "Press any key to Start", GREEN, HEIGHT*2//3)
+    if not loader.done:
+        draw_centered(small_font, f"Loading... {loader.progress:.0%}", BLACK, HEIGHT - 40)
+    elif scores_enabled:
+        draw_centered(small_font, "Tab: Top Scores", BLACK, HEIGHT - 40)
+
+def draw_game_over(state, scores_enabled):
     screen.blit(assets['images']['background'], (0, 0))
-    overlay = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
-    overlay.fill((0, 0, 0, 180))
-    screen.blit(overlay, (0, 0))
-    screen.blit(title_font.render("Game Over!", True, RED),
-               (WIDTH//2 - title_font.size("Game Over!")[0]//2, HEIGHT//3))
-    screen.blit(font.render(f"Final Score: {score}", True, WHITE),
-               (WIDTH//2 - font.size(f"Final Score: {score}")[0]//2, HEIGHT//2))
-    screen.blit(font.render("Press any key to Play Again", True, GREEN),
-               (WIDTH//2 - font.size("Press any key to Play Again")[0]//2, HEIGHT*2//3))
-
-# Main game loop
-running = True
-while running:
-    current_time = pygame.time.get_ticks()
-    
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
-        
-        if event.type == pygame.KEYDOWN:
-            if not game_active:
-                start_game()
-                continue
-
-            new_pos = list(player_pos)
-            if event.key == pygame.K_LEFT and player_pos[0] > 0: new_pos[0] -= 1
-            elif event.key == pygame.K_RIGHT and player_pos[0] < GRID_SIZE - 1: new_pos[0] += 1
-            elif event.key == pygame.K_UP and player_pos[1] > 0: new_pos[1] -= 1
-            elif event.key == pygame.K_DOWN and player_pos[1] < GRID_SIZE - 1: new_pos[1] += 1
-            
-            if new_pos != player_pos:
-                player_pos = new_pos
-                if assets['sounds']['click']: assets['sounds']['click'].play()
-                
-                selected_index = player_pos[1] * GRID_SIZE + player_pos[0]
-                if grid_values[selected_index] == correct_answer:
-                    score += 10
-                    feedback_text = ("Correct! +10", GREEN)
-                    if assets['sounds']['correct']: assets['sounds']['correct'].play()
-                    generate_grid()
-                else:
-                    score = max(0, score - 5)
-                    feedback_text = ("Wrong! -5", RED)
-                    if assets['sounds']['munch']: assets['sounds']['munch'].play()
-                
-                feedback_time = current_time + 1000
-
-    if game_active and current_time - last_enemy_move > ENEMY_SPEED:
-        move_enemy()
-        last_enemy_move = current_time
+    screen.blit(solid_overlay((WIDTH, HEIGHT), (0, 0, 0, 180)), (0, 0))
+    draw_centered(title_font, "Game Over!", RED, HEIGHT//3)
+    draw_centered(font, f"Final Score: {state.score}", WHITE, HEIGHT//2)
+    draw_centered(font, "Press any key to Play Again", GREEN, HEIGHT*2//3)
+    if scores_enabled:
+        draw_centered(small_font, "Tab: Top Scores", WHITE, HEIGHT - 40)
+
+def next_leaderboard(board, scores, mode, difficulty):
+    """Show the next date range of the leaderboard, or close it after the last one.
+
+    The query runs on the score store's thread; ``board`` is (range index, future).
+    """
+    i = 0 if board is None else board[0] + 1
+    if i == len(RANGES):
+        return None
+    return i, scores.top(mode, difficulty, range_start(RANGES[i][1]))
 
+def draw_leaderboard(board):
     screen.blit(assets['images']['background'], (0, 0))
-    if game_active:
-        draw_grid()
-        draw_entities()
-        draw_ui()
+    screen.blit(solid_overlay((WIDTH, HEIGHT), (0, 0, 0, 180)), (0, 0))
+    range_index, rows = board
+    draw_centered(title_font, f"Top Scores: {RANGES[range_index][0]}", GREEN, 40)
+    if not rows.done():
+        draw_centered(font, "Loading...", WHITE, HEIGHT//2)
+    elif rows.exception() is not None:
+        draw_centered(font, "Scores are unavailable", WHITE, HEIGHT//2)
+    elif not rows.result():
+        draw_centered(font, "No games yet", WHITE, HEIGHT//2)
     else:
-        draw_game_over() if lives <= 0 else draw_menu()
-    
-    pygame.display.flip()
-    clock.tick(60)
+        for rank, (student, score, played_at) in enumerate(rows.result(), 1):
+            y = 120 + (rank - 1) * 38
+            screen.blit(render_text(font, f"{rank}. {student}", WHITE), (WIDTH//4, y))
+            score_text = render_text(font, str(score), WHITE)
+            screen.blit(score_text, (WIDTH*3//4 - score_text.get_width(), y))
+    draw_centered(small_font, "Tab: next range    Any key: play", WHITE, HEIGHT - 40)
+
+def overlay_rect():
+    return pygame.Rect((WIDTH - OVERLAY_SIZE[0] - 10, 90), OVERLAY_SIZE)
+
+def handle_debug_key(key):
+    """Profiler hotkeys; returns True if ``key`` was one of them"""
+    if key == PROFILE_KEY:
+        profiler.toggle()
+        renderer.mark_full()
+    elif key == TRACE_KEY:
+        print(f"Wrote profile trace {profiler.dump()}")
+    else:
+        return False
+    return True
+
+def resize_display():
+    """Refit the frame after the window changed size"""
+    global screen
+    display.resize()
+    screen = renderer.screen = display.surface
+    renderer.mark_full()
+
+def wake_loop():
+    """Called on the classroom client's thread whenever a tick arrives"""
+    try:
+        pygame.event.post(pygame.event.Event(NETWORK_EVENT))
+    except pygame.error:
+        pass  # No display yet; the first frame polls anyway
+
+def main(replay=None, speed=1.0):
+    """Play the game (recording it), or show ``replay`` (a game.replay.Replay) at ``speed``.
+
+    With NUMCRUNCH_SERVER set the game runs on a classroom server
+    (game.classroom) and this window only sends keys and draws.
+    """
+    client = connect(student_name(), wake_loop) if replay is None else None
+    if client is not None:
+        options, seed = {'grid_size': client.grid_size}, None
+    elif replay is None:
+        # NUMCRUNCH_GRID_SIZE=100 plays on a large board that scrolls with the player
+        options = game_options(int(os.environ.get('NUMCRUNCH_GRID_SIZE', GRID_SIZE)))
+        seed = new_seed()
+    else:
+        options, seed = replay.options, replay.seed
+    init_display(options['grid_size'])
+    state = GameState(seed=seed, **options) if replay is None else replay.new_state()
+    # Profiles, recordings, telemetry and scores belong to whoever runs the game
+    local = replay is None and client is None
+
+    # Problems follow the student's mastery profile (replays bring a snapshot)
+    profile = load_profile() if local else None
+    if profile is not None:
+        state.facts = state_scheduler(state, profile)
+
+    # Game time runs from 0 so recordings don't depend on startup time
+    start = pygame.time.get_ticks()
+    recorder = start_recording(seed, options, profile=profile) if local else None
+    telemetry = start_telemetry() if local else None
+    if telemetry:
+        state.on_answer = telemetry.log
+
+    # Final scores go to the local score store in one batched insert per game
+    scores = open_scores() if local else None
+    mode = mode_name('division', options['grid_size'])
+    student = profile.student if profile is not None else student_name()
+    if scores:
+        def save_score(record):
+            scores.add(student, mode, record['difficulty'], record['score'], record['duration_ms'])
+            scores.flush()
+        state.on_game_over = save_score
+    board = None  # leaderboard on screen: (range index, future rows)
+
+    running = True
+    while running:
+        profiler.begin_frame()
+        # Menu and game over screens are static once assets have loaded
+        busy = (state.active or not loader.done or replay is not None
+                or (board is not None and not board[1].done()))
+        due = state.scheduler.next_due()
+        events = pacer.events(busy, None if due is None else start + due)
+        ticks = pygame.time.get_ticks()
+        current_time = int((ticks - start) * speed)
+        if replay is not None:
+            current_time = min(current_time, replay.end)
+        profiler.mark('wait')
+
+        for event in events:
+            if event.type == pygame.QUIT:
+                running = False
+            
+            if event.type == pygame.VIDEORESIZE:
+                resize_display()
+            elif event.type == pygame.VIDEOEXPOSE:
+                renderer.mark_full()
+            
+            if event.type == pygame.KEYDOWN and not handle_debug_key(event.key) and replay is None:
+                if event.key == LEADERBOARD_KEY and scores and not state.active:
+                    board = next_leaderboard(board, scores, mode, state.difficulty)
+                    continue
+                # Any key starts a game; only the arrow keys move
+                board = None
+                action = KEY_ACTIONS.get(event.key) if state.active else core.START
+                if action is not None and client is not None:
+                    client.send(action)
+                elif action is not None:
+                    if recorder:
+                        recorder.record(current_time, action)
+                    play_events(core.step(state, action, current_time))
+
+        if replay is not None:
+            for at, action in replay.due(current_time):
+                play_events(core.step(state, action, at))
+            if replay.finished and current_time >= replay.end:
+                running = False
+        profiler.mark('events')
+
+        # Swap in assets that finished loading in the background
+        if loader.poll():
+            renderer.mark_full()
+
+        sound_bank.tick(None if pacer.idle else ticks)
+
+        if client is not None:
+            play_events(client.poll(state))
+            if not client.connected:
+                print("Lost the connection to the classroom server")
+                running = False
+        else:
+            # Advance the enemy even when no key was pressed
+            play_events(core.step(state, None, current_time))
+        camera.follow(state.player_pos)
+        profiler.mark('logic')
+
+        standing = client.standing() if client is not None else None
+        track_regions(state, current_time, board, standing)
+        if profiler.enabled:
+            renderer.mark(overlay_rect())
+        if renderer.begin_frame():
+            if state.active:
+                draw_grid(state)
+                profiler.mark('draw_grid')
+                draw_entities(state)
+                profiler.mark('draw_entities')
+                draw_ui(state, current_time, standing)
+                profiler.mark('draw_ui')
+            elif board is not None:
+                draw_leaderboard(board)
+                profiler.mark('draw_leaderboard')
+            elif state.game_over:
+                draw_game_over(state, scores is not None)
+                profiler.mark('draw_game_over')
+            else:
+                draw_menu(scores is not None)
+                profiler.mark('draw_menu')
+            if profiler.enabled:
+                profiler.draw(screen, debug_font, overlay_rect().topleft)
+                profiler.mark('overlay')
+            renderer.present()
+            profiler.mark('present')
+        profiler.end_frame()
+
+    if recorder:
+        recorder.close(current_time)
+    if telemetry:
+        telemetry.close()
+    if profile is not None:
+        profile.save()
+    if scores:
+        scores.close()
+    if client is not None:
+        client.close()
+    if pacing_report_enabled():
+        print(pacer.report())
+        print(sound_bank.report())
+    pygame.quit()
+    sys.exit()
 
-pygame.quit()
-sys.exit()
\ No newline at end of file
+if __name__ == '__main__':
+    main()
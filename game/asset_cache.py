@@ -0,0 +1,98 @@
+"""Baked image cache.
+
+Decoding PNGs and scaling them is the slowest part of starting the game.
+The first launch writes every image, already scaled to its target size,
+as raw pixels to a cache file named after the source file's hash. Later
+launches memory-map that file, wrap it with ``pygame.image.frombuffer``
+and convert it once to the display's pixel format, so there is no PNG
+decode or scale and every later blit is a plain copy. Editing a source
+image changes its hash, so the old cache entry is ignored and replaced.
+
+Bake the sizes the game loads ahead of time with::
+
+    python -m game.asset_cache
+"""
+import hashlib
+import mmap
+import os
+from pathlib import Path
+
+import pygame
+
+from game.paths import cache_dir
+
+CACHE_VERSION = 1
+PIXEL_FORMAT = 'BGRA'  # byte order of 32-bit display surfaces on common platforms
+
+
+def source_hash(path):
+    return hashlib.sha1(Path(path).read_bytes()).hexdigest()[:16]
+
+
+def cache_path(path, size, directory=None, digest=None):
+    """Cache file for ``path`` at ``size``; ``digest`` skips hashing the source"""
+    directory = Path(directory) if directory else cache_dir()
+    name = Path(path).stem
+    digest = digest or source_hash(path)
+    return directory / f"{name}-{size[0]}x{size[1]}-v{CACHE_VERSION}-{digest}.{PIXEL_FORMAT.lower()}"
+
+
+def _display_format(surface):
+    """``surface`` converted to the display's pixel format, or copied if no
+    display is open yet; either way it owns its pixels"""
+    try:
+        return surface.convert_alpha()
+    except pygame.error:
+        return surface.copy()
+
+
+def _map_surface(baked, size):
+    # The frombuffer view over the read-only map is only read once, by the
+    # conversion; the map is released with it
+    with open(baked, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return _display_format(pygame.image.frombuffer(mapped, size, PIXEL_FORMAT))
+
+
+def bake_image(path, size, directory=None, digest=None):
+    """Decode and scale ``path`` and write it to the cache; returns the cache file"""
+    baked = cache_path(path, size, directory, digest)
+    image = pygame.transform.scale(pygame.image.load(str(path)), size)
+    data = pygame.image.tobytes(image, PIXEL_FORMAT)
+
+    baked.parent.mkdir(parents=True, exist_ok=True)
+    for stale in baked.parent.glob(f"{Path(path).stem}-{size[0]}x{size[1]}-*"):
+        stale.unlink(missing_ok=True)
+    tmp = baked.with_suffix('.tmp')
+    tmp.write_bytes(data)
+    os.replace(tmp, baked)
+    return baked
+
+
+def load_image(path, size, directory=None, digest=None):
+    """Return ``path`` scaled to ``size``, from the baked cache when possible.
+
+    Pass the source's ``digest`` (e.g. from the asset manifest) to avoid
+    reading the source file at all on a cache hit.
+    """
+    size = tuple(size)
+    try:
+        baked = cache_path(path, size, directory, digest)
+        if not baked.exists():
+            bake_image(path, size, directory, digest)
+        return _map_surface(baked, size)
+    except (OSError, ValueError, pygame.error):
+        # Cache not writable or damaged: fall back to decoding every launch
+        return _display_format(pygame.transform.scale(pygame.image.load(str(path)), size))
+
+
+if __name__ == '__main__':
+    # Exactly what the game loads; the window is scaled as a whole, so
+    # there are no per-resolution variants
+    from game.NumCrunch_Academy import image_size
+    from game.manifest import asset_digest, asset_file
+
+    for name in ['player', 'enemy', 'background']:
+        with asset_file(name) as path:
+            if path is not None:
+                print(f"Baked {bake_image(path, image_size(name), digest=asset_digest(name, path))}")
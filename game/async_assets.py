@@ -0,0 +1,65 @@
+"""Background asset loading.
+
+Images and sounds are decoded on a small thread pool while the game is
+already drawing its first frames with placeholder surfaces. The main loop
+calls ``poll()`` once per frame; finished assets are handed to their
+``apply`` callback on the main thread, so the game state is only ever
+touched from the loop.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+MAX_WORKERS = 4
+
+
+class AsyncAssetLoader:
+    def __init__(self, max_workers=MAX_WORKERS):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='assets')
+        self._pending = []
+        self.loaded = 0
+        self.failed = 0
+
+    def submit(self, load, apply, *args):
+        """Run ``load(*args)`` on a worker and later ``apply(result)`` in ``poll``"""
+        self._pending.append((self._pool.submit(load, *args), apply))
+
+    def poll(self):
+        """Apply every finished load; returns True if any asset was swapped in"""
+        if not self._pending:
+            return False
+        swapped = False
+        still_pending = []
+        for future, apply in self._pending:
+            if not future.done():
+                still_pending.append((future, apply))
+                continue
+            try:
+                result = future.result()
+            except Exception:
+                # Keep the placeholder
+                self.failed += 1
+                continue
+            if result is not None:
+                apply(result)
+                swapped = True
+            self.loaded += 1
+        self._pending = still_pending
+        return swapped
+
+    @property
+    def done(self):
+        return not self._pending
+
+    @property
+    def progress(self):
+        total = self.loaded + self.failed + len(self._pending)
+        return (self.loaded + self.failed) / total if total else 1.0
+
+    def wait(self):
+        """Block until everything is loaded and applied (for tools and tests)"""
+        for future, _ in list(self._pending):
+            future.exception()
+        self.poll()
+
+    def close(self):
+        """Stop the worker threads; loads still queued are abandoned"""
+        self._pool.shutdown(wait=False, cancel_futures=True)
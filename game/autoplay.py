@@ -0,0 +1,91 @@
+"""Scripted player for the headless game.
+
+The bot walks a shortest path to the correct answer, preferring routes
+that keep clear of the enemy, and presses at most one key every
+``reaction_ms`` so it plays at a human-like pace.
+"""
+from collections import deque
+
+from game import core
+
+REACTION_MS = 400
+
+
+def find_path_action(state, avoid_enemy=True):
+    """Return the first move of a BFS path to the correct cell, or None"""
+    size = state.grid_size
+    start = tuple(state.player_pos)
+    target = state.grid_values.index(state.correct_answer)
+    goal = (target % size, target // size)
+
+    blocked = set(state.walls)
+    if avoid_enemy:
+        for ex, ey in state.enemies:
+            blocked.add((ex, ey))
+            for dx, dy in core.MOVES.values():
+                blocked.add((ex + dx, ey + dy))
+        blocked.discard(goal)
+        blocked.discard(start)
+
+    first_move = {start: None}
+    queue = deque([start])
+    while queue:
+        pos = queue.popleft()
+        if pos == goal:
+            return first_move[pos]
+        for action, (dx, dy) in core.MOVES.items():
+            nxt = (pos[0] + dx, pos[1] + dy)
+            if (0 <= nxt[0] < size and 0 <= nxt[1] < size
+                    and nxt not in first_move and nxt not in blocked):
+                first_move[nxt] = first_move[pos] or action
+                queue.append(nxt)
+    return None
+
+
+def choose_action(state):
+    action = find_path_action(state)
+    if action is None:
+        action = find_path_action(state, avoid_enemy=False)
+    if action is None:
+        # Respawned onto the answer: step off so it can be collected
+        x, y = state.player_pos
+        for candidate, (dx, dy) in core.MOVES.items():
+            if (0 <= x + dx < state.grid_size and 0 <= y + dy < state.grid_size
+                    and (x + dx, y + dy) not in state.walls):
+                return candidate
+    return action
+
+
+class Bot:
+    def __init__(self, reaction_ms=REACTION_MS):
+        self.reaction_ms = reaction_ms
+        self.next_move = 0
+
+    def act(self, state, now):
+        if now < self.next_move:
+            return None
+        self.next_move = now + self.reaction_ms
+        return choose_action(state)
+
+
+def play_game(params, seed, max_ms=10 * 60 * 1000, dt=1000 // 60, reaction_ms=REACTION_MS):
+    """Play one seeded game with the bot and return its statistics"""
+    state = core.GameState(seed=seed, **params)
+    bot = Bot(reaction_ms)
+    core.step(state, core.START, 0)
+    correct = wrong = 0
+    now = 0
+    while state.active and now < max_ms:
+        now += dt
+        for event in core.step(state, bot.act(state, now), now):
+            if event == core.EVENT_CORRECT:
+                correct += 1
+            elif event == core.EVENT_WRONG:
+                wrong += 1
+    return {
+        'survival_ms': now,
+        'score': state.score,
+        'correct': correct,
+        'wrong': wrong,
+        'survived': state.active,
+    }
@@ -0,0 +1,153 @@
+"""Vectorized batch simulator.
+
+Runs N independent games of the rules in ``game.core`` as NumPy arrays so
+difficulty parameters can be swept over thousands of games at once. The
+enemy speed and distractor range may be given per game to run a whole
+parameter sweep in one batch. Batches model the classic board: one enemy
+and no walls.
+
+Requires NumPy (``pip install numcrunch-academy[sim]``).
+"""
+import numpy as np
+
+from game.core import (GRID_SIZE, ENEMY_SPEED, DISTRACTOR_RANGE, START_LIVES,
+                       CORRECT_POINTS, WRONG_PENALTY, LEFT, RIGHT, UP, DOWN)
+
+# Action codes used by BatchGame.step
+NONE = 0
+ACTION_CODES = {None: NONE, LEFT: 1, RIGHT: 2, UP: 3, DOWN: 4}
+ACTION_DELTAS = np.array([(0, 0), (-1, 0), (1, 0), (0, -1), (0, 1)], dtype=np.int64)
+
+
+def _per_game(value, n, dtype):
+    return np.broadcast_to(np.asarray(value, dtype=dtype), (n,)).copy()
+
+
+class BatchGame:
+    """N games advanced together; state is held in arrays of length N"""
+
+    def __init__(self, n, grid_size=GRID_SIZE, enemy_speed=ENEMY_SPEED,
+                 distractor_range=DISTRACTOR_RANGE, seed=None):
+        self.n = n
+        self.grid_size = grid_size
+        self.enemy_speed = _per_game(enemy_speed, n, np.int64)
+        self.distractor_range = _per_game(distractor_range, n, np.int64)
+        self.rng = np.random.default_rng(seed)
+        self.reset()
+
+    def reset(self, now=0):
+        n, size = self.n, self.grid_size
+        self.player_pos = np.full((n, 2), size // 2, dtype=np.int64)
+        self.enemy_pos = np.zeros((n, 2), dtype=np.int64)
+        self.grid_values = np.zeros((n, size * size), dtype=np.int64)
+        self.divisor = np.zeros(n, dtype=np.int64)
+        self.correct_answer = np.zeros(n, dtype=np.int64)
+        self.score = np.zeros(n, dtype=np.int64)
+        self.lives = np.full(n, START_LIVES, dtype=np.int64)
+        self.active = np.ones(n, dtype=bool)
+        self.last_enemy_move = np.full(n, now, dtype=np.int64)
+        self.end_time = np.full(n, -1, dtype=np.int64)
+        self.correct_count = np.zeros(n, dtype=np.int64)
+        self.wrong_count = np.zeros(n, dtype=np.int64)
+        self.generate_grid(np.ones(n, dtype=bool))
+
+    def generate_grid(self, mask):
+        """Regenerate problem and grid for the games selected by ``mask``"""
+        rows = np.flatnonzero(mask)
+        if rows.size == 0:
+            return
+        rng, cells = self.rng, self.grid_size * self.grid_size
+        count = rows.size
+
+        divisor = rng.integers(2, 13, count)
+        answer = rng.integers(2, 13, count)
+        self.divisor[rows] = divisor
+        self.correct_answer[rows] = answer
+
+        # Wrong answers: uniform over answer +- spread, excluding the answer
+        # and values <= 0, sampled directly instead of by rejection
+        spread = self.distractor_range[rows][:, None]
+        below = np.minimum(spread, answer[:, None] - 1)
+        pick = (rng.random((count, cells)) * (below + spread)).astype(np.int64)
+        offset = pick - below
+        offset += offset >= 0
+        values = answer[:, None] + offset
+
+        # Correct cell: any cell except the player's and enemy's
+        player_idx = self.player_pos[rows, 1] * self.grid_size + self.player_pos[rows, 0]
+        enemy_idx = self.enemy_pos[rows, 1] * self.grid_size + self.enemy_pos[rows, 0]
+        low = np.minimum(player_idx, enemy_idx)
+        high = np.maximum(player_idx, enemy_idx)
+        distinct = low != high
+        slot = (rng.random(count) * (cells - 1 - distinct)).astype(np.int64)
+        slot += slot >= low
+        slot += distinct & (slot >= high)
+        values[np.arange(count), slot] = answer
+
+        self.grid_values[rows] = values
+
+    def step(self, actions, now):
+        """Apply one action code per game at time ``now`` and advance enemies"""
+        actions = np.asarray(actions)
+        size = self.grid_size
+        active = self.active
+
+        # Player moves
+        new_pos = np.clip(self.player_pos + ACTION_DELTAS[actions], 0, size - 1)
+        moved = active & (new_pos != self.player_pos).any(axis=1)
+        self.player_pos[moved] = new_pos[moved]
+        index = self.player_pos[:, 1] * size + self.player_pos[:, 0]
+        selected = self.grid_values[np.arange(self.n), index]
+        correct = moved & (selected == self.correct_answer)
+        wrong = moved & ~correct
+        self.score[correct] += CORRECT_POINTS
+        self.score[wrong] = np.maximum(0, self.score[wrong] - WRONG_PENALTY)
+        self.correct_count += correct
+        self.wrong_count += wrong
+        self.generate_grid(correct)
+
+        # Enemy moves one step toward the player along a random valid axis
+        due = active & (now - self.last_enemy_move > self.enemy_speed)
+        delta = np.sign(self.player_pos - self.enemy_pos)
+        both = (delta != 0).all(axis=1)
+        drop_x = both & (self.rng.random(self.n) < 0.5)
+        delta[drop_x, 0] = 0
+        delta[both & ~drop_x, 1] = 0
+        self.enemy_pos[due] += delta[due]
+        self.last_enemy_move[due] = now
+
+        # Collisions
+        hit = due & (self.enemy_pos == self.player_pos).all(axis=1)
+        self.lives[hit] -= 1
+        self.player_pos[hit] = size // 2
+        dead = hit & (self.lives <= 0)
+        self.active[dead] = False
+        self.end_time[dead] = now
+
+    def run(self, policy, ticks, dt=1000 // 60, start=0):
+        """Run ``ticks`` steps; ``policy(batch)`` returns an action code per game"""
+        now = start
+        for _ in range(ticks):
+            if not self.active.any():
+                break
+            self.step(policy(self), now)
+            now += dt
+        self.end_time[self.active] = now
+        return now
+
+    def random_actions(self, move_chance=1.0):
+        """Random policy: with ``move_chance`` press a random arrow key"""
+        codes = self.rng.integers(1, 5, self.n)
+        codes[self.rng.random(self.n) >= move_chance] = NONE
+        return codes
+
+    def summary(self):
+        survival = np.maximum(self.end_time, 0)
+        minutes = np.maximum(survival, 1) / 60000
+        return {
+            'games': self.n,
+            'mean_score': float(self.score.mean()),
+            'mean_survival_ms': float(survival.mean()),
+            'answers_per_minute': float((self.correct_count / minutes).mean()),
+            'still_alive': int(self.active.sum()),
+        }
@@ -0,0 +1,236 @@
+"""Headless frame-time benchmark.
+
+Drives the rendering paths of both game/NumCrunch_Academy.py and
+src/NumCrunch_Academy.py with scripted input under SDL's dummy video
+driver, times every frame and the functions it is made of, and reports
+p50/p95/p99 in milliseconds. game/ is run across board sizes (boards
+bigger than the view scroll with the player) and window resolutions (the
+800x600 frame is scaled to the window; NUMCRUNCH_SCALING=smooth applies);
+src/ only has its fixed 5x5, 800x600 layout.
+
+    python -m game.benchmark --frames 600 --output bench.json
+    python -m game.benchmark --compare bench.json
+
+With --compare, scenarios and functions whose p50 or p95 got slower than
+the baseline by more than --threshold (and by at least --min-delta ms, to
+ignore timer noise on very cheap calls) are listed and the exit status
+is 1.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import pygame
+
+RESULTS_VERSION = 1
+FRAME_MS = 1000 // 60
+SRC_SCRIPT = Path(__file__).resolve().parent.parent / 'src' / 'NumCrunch_Academy.py'
+PERCENTILES = (50, 95, 99)
+
+
+class Timings:
+    """Nanosecond samples per name"""
+
+    def __init__(self):
+        self.samples = {}
+
+    def time(self, name, function, *args):
+        start = time.perf_counter_ns()
+        result = function(*args)
+        self.samples.setdefault(name, []).append(time.perf_counter_ns() - start)
+        return result
+
+    def add(self, name, ns):
+        self.samples.setdefault(name, []).append(ns)
+
+    def summary(self):
+        """name -> {'p50', 'p95', 'p99', 'mean', 'max'} in milliseconds"""
+        result = {}
+        for name, samples in self.samples.items():
+            ms = [ns / 1e6 for ns in samples]
+            cuts = statistics.quantiles(ms, n=100, method='inclusive') if len(ms) > 1 else ms * 99
+            stats = {f'p{p}': round(cuts[p - 1], 4) for p in PERCENTILES}
+            stats['mean'] = round(statistics.fmean(ms), 4)
+            stats['max'] = round(max(ms), 4)
+            result[name] = stats
+        return result
+
+
+def scripted_actions(frames, seed, move_every=4):
+    """A key press every ``move_every`` frames, in a fixed random order"""
+    rng = random.Random(seed)
+    moves = ['left', 'right', 'up', 'down']
+    return [rng.choice(moves) if i % move_every == 0 else None for i in range(frames)]
+
+
+def bench_game(frames, grid_size, resolution, seed):
+    """Time game/'s draw path on a ``grid_size`` board in a ``resolution`` window"""
+    from game import NumCrunch_Academy as app
+    from game import core
+
+    app.init_display(grid_size, resolution)
+    app.loader.wait()
+    # Every scenario builds a new loader; don't leave its idle workers behind
+    app.loader.close()
+
+    state = core.GameState(seed=seed, **app.game_options(grid_size))
+    core.step(state, core.START, 0)
+    timings = Timings()
+    for _ in range(frames):
+        timings.time('generate_grid', core.generate_grid, state)
+
+    for i, action in enumerate(scripted_actions(frames, seed)):
+        now = i * FRAME_MS
+        start = time.perf_counter_ns()
+        if not state.active:
+            core.step(state, core.START, now)
+        timings.time('step', core.step, state, action, now)
+        app.camera.follow(state.player_pos)
+        timings.time('draw_grid', app.draw_grid, state)
+        timings.time('draw_entities', app.draw_entities, state)
+        timings.time('draw_ui', app.draw_ui, state, now)
+        timings.time('present', app.display.present)
+        timings.add('frame', time.perf_counter_ns() - start)
+    return timings
+
+
+def load_src():
+    """Import src/NumCrunch_Academy.py as a module, without running its loop"""
+    spec = importlib.util.spec_from_file_location('numcrunch_src', SRC_SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.loader.wait()
+    module.loader.close()
+    return module
+
+
+def bench_src(frames, seed):
+    """Time src/'s draw path; key presses go through the same checks as its loop"""
+    app = load_src()
+    random.seed(seed)
+    timings = Timings()
+    for _ in range(frames):
+        timings.time('generate_grid', app.generate_grid)
+
+    steps = {'left': (-1, 0), 'right': (1, 0), 'up': (0, -1), 'down': (0, 1)}
+    for i, action in enumerate(scripted_actions(frames, seed)):
+        now = i * FRAME_MS
+        start = time.perf_counter_ns()
+        if app.game_state == "game_over":
+            app.lives, app.score, app.game_state = 3, 0, "playing"
+        if action is not None:
+            dx, dy = steps[action]
+            x, y = app.player_pos[0] + dx, app.player_pos[1] + dy
+            if 0 <= x < app.GRID_SIZE and 0 <= y < app.GRID_SIZE:
+                app.player_pos[:] = [x, y]
+                timings.time('check_answer', app.check_answer)
+                app.check_troggle_collision()
+        app.scheduler.run_due(now)
+        timings.time('draw_grid', app.draw_grid)
+        timings.time('draw_player', app.draw_player)
+        timings.time('draw_troggle', app.draw_troggle)
+        timings.time('draw_hud', app.draw_hud)
+        timings.time('present', app.display.present)
+        timings.add('frame', time.perf_counter_ns() - start)
+    return timings
+
+
+def run(frames, grid_sizes, resolutions, seed, include_src=True):
+    scenarios = []
+    for resolution in resolutions:
+        for grid_size in grid_sizes:
+            timings = bench_game(frames, grid_size, resolution, seed)
+            scenarios.append({'path': 'game', 'grid_size': grid_size, 'resolution': list(resolution),
+                              'timings': timings.summary()})
+    if include_src:
+        scenarios.append({'path': 'src', 'grid_size': 5, 'resolution': [800, 600],
+                          'timings': bench_src(frames, seed).summary()})
+    return {
+        'version': RESULTS_VERSION,
+        'frames': frames,
+        'seed': seed,
+        'python': platform.python_version(),
+        'pygame': pygame.version.ver,
+        'platform': platform.platform(),
+        'scenarios': scenarios,
+    }
+
+
+def scenario_key(scenario):
+    width, height = scenario['resolution']
+    return f"{scenario['path']} {scenario['grid_size']}x{scenario['grid_size']} @ {width}x{height}"
+
+
+def compare(results, baseline, threshold, min_delta=0.05):
+    """Lines describing p50/p95 regressions beyond ``threshold`` (a fraction) and ``min_delta`` ms"""
+    previous = {scenario_key(s): s['timings'] for s in baseline['scenarios']}
+    regressions = []
+    for scenario in results['scenarios']:
+        key = scenario_key(scenario)
+        for name, stats in scenario['timings'].items():
+            old = previous.get(key, {}).get(name)
+            if old is None:
+                continue
+            for p in ('p50', 'p95'):
+                if stats[p] > old[p] * (1 + threshold) and stats[p] - old[p] >= min_delta:
+                    regressions.append(f"{key} {name} {p}: {old[p]:.3f} -> {stats[p]:.3f} ms "
+                                       f"(+{stats[p] / old[p] - 1 if old[p] else 1:.0%})")
+    return regressions
+
+
+def print_results(results):
+    for scenario in results['scenarios']:
+        print(scenario_key(scenario))
+        for name, stats in scenario['timings'].items():
+            print(f"  {name:<14} p50 {stats['p50']:7.3f}  p95 {stats['p95']:7.3f}  "
+                  f"p99 {stats['p99']:7.3f} ms")
+
+
+def parse_resolution(text):
+    width, height = text.lower().split('x')
+    return int(width), int(height)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--frames', type=int, default=600)
+    parser.add_argument('--grid-sizes', type=int, nargs='+', default=[5, 20, 100])
+    parser.add_argument('--resolutions', type=parse_resolution, nargs='+',
+                        default=[(800, 600), (1280, 720), (3840, 2160)])
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--no-src', action='store_true', help="skip src/NumCrunch_Academy.py")
+    parser.add_argument('--output', help="write results as JSON")
+    parser.add_argument('--compare', help="baseline JSON from an earlier --output")
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help="slowdown that counts as a regression (default 0.10)")
+    parser.add_argument('--min-delta', type=float, default=0.05,
+                        help="smallest slowdown in ms that counts (default 0.05)")
+    args = parser.parse_args(argv)
+
+    results = run(args.frames, args.grid_sizes, args.resolutions, args.seed, not args.no_src)
+    print_results(results)
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2) + '\n')
+    if args.compare:
+        regressions = compare(results, json.loads(Path(args.compare).read_text()),
+                              args.threshold, args.min_delta)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+        print("No regressions")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,48 @@
+"""Viewport over boards bigger than the screen.
+
+The camera shows a ``view_size`` x ``view_size`` window of the board that
+follows the player, clamped to the board's edges. Drawing, text rendering
+and entity culling only ever look at the cells inside that window, so their
+cost depends on the view, not on the board. When the board fits in the
+view the origin stays at (0, 0) and nothing scrolls.
+"""
+
+
+def view_origin(grid_size, view_size, pos):
+    """Board (x, y) of the top-left cell a view centered on ``pos`` shows"""
+    limit = max(grid_size - view_size, 0)
+    half = min(view_size, grid_size) // 2
+    return min(max(pos[0] - half, 0), limit), min(max(pos[1] - half, 0), limit)
+
+
+class Camera:
+    def __init__(self, grid_size, view_size):
+        self.grid_size = grid_size
+        self.view_size = min(view_size, grid_size)
+        self.origin = (0, 0)  # board (x, y) of the top-left visible cell
+
+    def follow(self, pos):
+        """Center the view on ``pos`` as far as the board edges allow"""
+        self.origin = view_origin(self.grid_size, self.view_size, pos)
+        return self.origin
+
+    def contains(self, pos):
+        x, y = pos[0] - self.origin[0], pos[1] - self.origin[1]
+        return 0 <= x < self.view_size and 0 <= y < self.view_size
+
+    def to_view(self, pos):
+        """Board (x, y) -> (x, y) within the view"""
+        return pos[0] - self.origin[0], pos[1] - self.origin[1]
+
+    def visible_values(self, grid_values):
+        """Row-major values of the visible cells"""
+        size, view = self.grid_size, self.view_size
+        left, top = self.origin
+        if view == size:
+            return grid_values
+        values = []
+        for row in range(top, top + view):
+            start = row * size + left
+            values.extend(grid_values[start:start + view])
+        return values
+
@@ -0,0 +1,639 @@
+"""LAN classroom mode.
+
+One machine runs ``ClassroomServer``, an asyncio server that owns every
+student's game (a core.GameState each) and steps it with core.step, so
+clients only send key presses and draw what they are told. Every TICK_MS
+the server sends each client what changed in its game since the last tick,
+plus changes to the class roster (names, scores, lives):
+
+    frame:   payload length (u32), payload
+    hello:   HELLO, student name                       (client -> server)
+    action:  ACTION, action code (see game.replay)     (client -> server)
+    welcome: WELCOME, player id, grid size, tick ms    (server -> client)
+    refused: REFUSED, reason                           (server -> client)
+    tick:    TICK, field mask, then each field in the mask, in bit order
+
+Integers are varints (zigzag for values that may be negative) and strings
+are length-prefixed UTF-8, so a typical tick is a few bytes and an idle
+game sends nothing. The work per tick is linear in the number of players:
+a game's delta is encoded once for its one client, and roster changes are
+encoded once and the same bytes appended to every client's tick. Clients
+that fall too far behind (MAX_BUFFER) are dropped rather than slowing the
+rest of the class down, and so are clients that announce a frame longer
+than MAX_FRAME.
+
+The server loads each student's mastery profile (game.mastery) when they
+join and saves it when they leave, and writes the scores of every game
+that ended during a tick in one batch (game.scores). A second window
+joining under the name of someone already playing is refused, so two games
+never share (and overwrite) one profile.
+
+    python -m game.classroom serve [--port 5999] [--grid-size 5]
+    python -m game.classroom loopback [--clients 30] [--seconds 20]
+
+``loopback`` runs a server and bot students on this machine and reports
+the server's tick cost. Players join with NUMCRUNCH_SERVER=host[:port]
+(or NUMCRUNCH_SERVER=loopback to play against bots without a server).
+"""
+import argparse
+import asyncio
+import os
+import queue
+import random
+import socket
+import struct
+import sys
+import threading
+import time
+import traceback
+from array import array
+from collections import deque
+
+from game import core
+from game.autoplay import Bot
+from game.mastery import load_profile, profile_path, state_scheduler
+from game.replay import ACTION_CODES, ACTIONS
+from game.scores import mode_name, open_scores
+
+PORT = 5999
+TICK_MS = 50
+MAX_BUFFER = 256 * 1024  # bytes queued for one client before it is dropped
+MAX_FRAME = 4096         # largest message a client may send (hello, action)
+LENGTH = struct.Struct('<I')
+
+# Message types
+HELLO, ACTION = 0, 1     # client -> server
+WELCOME, TICK, REFUSED = 0, 1, 2   # server -> client
+
+# Tick fields, in mask bit order
+POSITION, ENEMIES, GRID, PROBLEM, STATUS, FEEDBACK, EVENTS, ROSTER, LEFT = range(9)
+
+EVENT_CODES = (core.EVENT_START, core.EVENT_CLICK, core.EVENT_CORRECT, core.EVENT_WRONG,
+               core.EVENT_HURT, core.EVENT_GAME_OVER)
+FEEDBACK_KINDS = (None, 'correct', 'wrong')
+
+
+def _uint(value, out):
+    while value >= 0x80:
+        out.append(value & 0x7f | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _int(value, out):
+    _uint(value << 1 if value >= 0 else (-value << 1) - 1, out)
+
+
+def _text(value, out):
+    encoded = value.encode()
+    _uint(len(encoded), out)
+    out += encoded
+
+
+class _Reader:
+    def __init__(self, data):
+        self.data = data
+        self.offset = 0
+
+    def uint(self):
+        value = shift = 0
+        while True:
+            byte = self.data[self.offset]
+            self.offset += 1
+            value |= (byte & 0x7f) << shift
+            shift += 7
+            if not byte & 0x80:
+                return value
+
+    def int(self):
+        value = self.uint()
+        return value >> 1 if not value & 1 else -((value + 1) >> 1)
+
+    def text(self):
+        length = self.uint()
+        self.offset += length
+        return bytes(self.data[self.offset - length:self.offset]).decode()
+
+
+def frame(payload):
+    return LENGTH.pack(len(payload)) + payload
+
+
+def _encode_fields(fields):
+    """Tick body for {field: value}; returns (mask, bytes)"""
+    mask = 0
+    out = bytearray()
+    for field in sorted(fields):
+        mask |= 1 << field
+        value = fields[field]
+        if field == POSITION:
+            _uint(value[0], out)
+            _uint(value[1], out)
+        elif field == ENEMIES:
+            _uint(len(value), out)
+            for x, y in value:
+                _uint(x, out)
+                _uint(y, out)
+        elif field == GRID:
+            _uint(len(value), out)
+            for cell in value:
+                _int(cell, out)
+        elif field == PROBLEM:
+            _text(value[0], out)
+            _int(value[1], out)
+        elif field == STATUS:
+            _uint(value[0], out)
+            _uint(max(value[1], 0), out)
+            out.append(value[2])
+        elif field == FEEDBACK:
+            out.append(0 if value is None else FEEDBACK_KINDS.index(value[1]))
+            if value is not None:
+                _text(value[0], out)
+        elif field == EVENTS:
+            _uint(len(value), out)
+            out += bytes(EVENT_CODES.index(event) for event in value)
+        elif field == ROSTER:
+            _uint(len(value), out)
+            for player_id, (name, score, lives, active) in value:
+                _uint(player_id, out)
+                _text(name, out)
+                _uint(score, out)
+                _uint(max(lives, 0), out)
+                out.append(active)
+        elif field == LEFT:
+            _uint(len(value), out)
+            for player_id in value:
+                _uint(player_id, out)
+    return mask, bytes(out)
+
+
+def tick_payload(fields, shared=(0, b'')):
+    """A TICK message for {field: value} plus already-encoded ``shared`` fields"""
+    mask, body = _encode_fields(fields)
+    out = bytearray([TICK])
+    _uint(mask | shared[0], out)
+    return bytes(out) + body + shared[1]
+
+
+def apply_tick(payload, state, roster):
+    """Copy a TICK into the mirror ``state`` and ``roster``; returns the game's events"""
+    data = _Reader(payload)
+    data.offset = 1
+    mask = data.uint()
+    events = []
+    if mask & 1 << POSITION:
+        state.player_pos = [data.uint(), data.uint()]
+    if mask & 1 << ENEMIES:
+        state.enemies = [[data.uint(), data.uint()] for _ in range(data.uint())]
+    if mask & 1 << GRID:
+        state.grid_values = array('i', (data.int() for _ in range(data.uint())))
+    if mask & 1 << PROBLEM:
+        state.current_problem = data.text()
+        state.correct_answer = data.int()
+    if mask & 1 << STATUS:
+        state.score, state.lives = data.uint(), data.uint()
+        state.active = bool(data.uint())
+    if mask & 1 << FEEDBACK:
+        kind = FEEDBACK_KINDS[data.uint()]
+        # The server clears feedback when it expires
+        state.feedback = None if kind is None else (data.text(), kind)
+        state.feedback_time = float('inf')
+    if mask & 1 << EVENTS:
+        events = [EVENT_CODES[data.uint()] for _ in range(data.uint())]
+    if mask & 1 << ROSTER:
+        for _ in range(data.uint()):
+            player_id = data.uint()
+            roster[player_id] = (data.text(), data.uint(), data.uint(), bool(data.uint()))
+    if mask & 1 << LEFT:
+        for _ in range(data.uint()):
+            roster.pop(data.uint(), None)
+    return events
+
+
+class Player:
+    def __init__(self, player_id, name, state, writer):
+        self.id = player_id
+        self.name = name
+        self.state = state
+        self.writer = writer
+        self.events = []
+        self.sent = {}        # field -> value last sent to this client
+        self.has_roster = False
+        self.profile = None
+
+
+class ClassroomServer:
+    def __init__(self, options=None, tick_ms=TICK_MS, seed=None, scores=None, profiles=True):
+        self.options = options or core.board_options()
+        self.tick_ms = tick_ms
+        self.scores = scores
+        self.profiles = profiles
+        self.mode = mode_name('division', self.options['grid_size'])
+        self.players = {}
+        self.rng = random.Random(seed)
+        self.tick_times = deque(maxlen=1200)  # seconds spent in each tick
+        self.bytes_sent = 0
+        self.tick_errors = 0
+        self._next_id = 1
+        self._roster = {}     # player id -> roster entry last broadcast
+        self._left = []
+        self._start = None
+        self._ticker = None
+
+    def now(self):
+        return int((time.monotonic() - self._start) * 1000)
+
+    async def serve(self, host='0.0.0.0', port=PORT):
+        """Start listening and ticking; returns the asyncio server"""
+        self._start = time.monotonic()
+        server = await asyncio.start_server(self._handle, host, port)
+        self._ticker = asyncio.get_running_loop().create_task(self._run_ticks())
+        return server
+
+    def name_taken(self, name):
+        """Whether someone playing already has ``name``'s mastery profile"""
+        path = profile_path(name)
+        return any(profile_path(player.name) == path for player in self.players.values())
+
+    def join(self, name, writer):
+        player = Player(self._next_id, name, core.GameState(seed=self.rng.getrandbits(63),
+                                                           **self.options), writer)
+        self._next_id += 1
+        if self.profiles:
+            player.profile = load_profile(name)
+            if player.profile is not None:
+                player.state.facts = state_scheduler(player.state, player.profile)
+        if self.scores is not None:
+            player.state.on_game_over = lambda record: self.scores.add(
+                name, self.mode, record['difficulty'], record['score'], record['duration_ms'])
+        self.players[player.id] = player
+        return player
+
+    def leave(self, player):
+        if self.players.pop(player.id, None) is None:
+            return
+        self._roster.pop(player.id, None)
+        self._left.append(player.id)
+        if player.profile is not None:
+            player.profile.save()
+        player.writer.close()
+
+    def act(self, player, action):
+        player.events += core.step(player.state, action, self.now())
+
+    async def _handle(self, reader, writer):
+        writer.get_extra_info('socket').setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        player = None
+        try:
+            hello = await _read_frame(reader)
+            if hello[0] != HELLO:
+                return
+            name = _Reader(hello[1:]).text()[:32] or f'player{self._next_id}'
+            if self.name_taken(name):
+                refused = bytearray([REFUSED])
+                _text(f"{name} is already playing", refused)
+                writer.write(frame(bytes(refused)))
+                await writer.drain()
+                return
+            player = self.join(name, writer)
+            welcome = bytearray([WELCOME])
+            for value in (player.id, self.options['grid_size'], self.tick_ms):
+                _uint(value, welcome)
+            writer.write(frame(bytes(welcome)))
+            while True:
+                message = await _read_frame(reader)
+                if message[0] == ACTION and message[1] in ACTIONS and player.id in self.players:
+                    self.act(player, ACTIONS[message[1]])
+        except (asyncio.IncompleteReadError, ConnectionError, IndexError, UnicodeDecodeError):
+            pass
+        finally:
+            if player is not None:
+                self.leave(player)
+            else:
+                writer.close()
+
+    async def _run_ticks(self):
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+        while True:
+            next_tick += self.tick_ms / 1000
+            await asyncio.sleep(max(0.0, next_tick - loop.time()))
+            started = time.perf_counter()
+            try:
+                self.tick()
+            except Exception:
+                # One bad game must not stop every other student's clock;
+                # the first failure is printed in full, later ones counted
+                self.tick_errors += 1
+                if self.tick_errors == 1:
+                    traceback.print_exc()
+                else:
+                    print(f"Classroom tick failed ({self.tick_errors} so far): "
+                          f"{traceback.format_exc(limit=0).strip()}", file=sys.stderr)
+            self.tick_times.append(time.perf_counter() - started)
+
+    def tick(self):
+        now = self.now()
+        for player in self.players.values():
+            player.events += core.step(player.state, None, now)
+
+        # Roster changes are encoded once for the whole class
+        changed = []
+        for player in self.players.values():
+            state = player.state
+            entry = (player.name, state.score, state.lives, state.active)
+            if self._roster.get(player.id) != entry:
+                self._roster[player.id] = entry
+                changed.append((player.id, entry))
+        shared = {}
+        if changed:
+            shared[ROSTER] = changed
+        if self._left:
+            shared[LEFT], self._left = self._left, []
+        shared = _encode_fields(shared)
+        full_roster = None
+
+        for player in list(self.players.values()):
+            fields = self._changes(player)
+            if not player.has_roster:
+                # First tick for this client: it needs everyone, not just changes
+                if full_roster is None:
+                    full_roster = _encode_fields({ROSTER: list(self._roster.items())})
+                player.has_roster = True
+                payload = tick_payload(fields, full_roster)
+            elif fields or shared[0]:
+                payload = tick_payload(fields, shared)
+            else:
+                continue
+            transport = player.writer.transport
+            if transport.is_closing() or transport.get_write_buffer_size() > MAX_BUFFER:
+                self.leave(player)
+                continue
+            player.writer.write(frame(payload))
+            self.bytes_sent += len(payload) + LENGTH.size
+
+        if self.scores is not None:
+            self.scores.flush()
+
+    @staticmethod
+    def _changes(player):
+        state = player.state
+        current = {
+            POSITION: tuple(state.player_pos),
+            ENEMIES: tuple(tuple(pos) for pos in state.enemies),
+            # generate_grid always builds a new array, so identity is enough
+            GRID: state.grid_values,
+            PROBLEM: (state.current_problem, state.correct_answer),
+            STATUS: (state.score, state.lives, state.active),
+            FEEDBACK: state.feedback,
+        }
+        fields = {}
+        for field, value in current.items():
+            last = player.sent.get(field, ())
+            if value is not last and (field == GRID or value != last):
+                fields[field] = value
+                player.sent[field] = value
+        if player.events:
+            fields[EVENTS], player.events = player.events, []
+        return fields
+
+    def close(self):
+        if self._ticker is not None:
+            self._ticker.cancel()
+        for player in list(self.players.values()):
+            self.leave(player)
+        if self.scores is not None:
+            self.scores.close()
+
+
+async def _read_frame(reader, limit=MAX_FRAME):
+    (length,) = LENGTH.unpack(await reader.readexactly(LENGTH.size))
+    if length > limit:
+        # Don't let a peer make us buffer an arbitrarily large message
+        raise ConnectionError(f"{length} byte frame is over the {limit} byte limit")
+    return await reader.readexactly(length)
+
+
+def _hello(name):
+    out = bytearray([HELLO])
+    _text(name, out)
+    return frame(bytes(out))
+
+
+def _welcome(payload):
+    data = _Reader(payload)
+    data.offset = 1
+    if payload[0] == REFUSED:
+        raise ConnectionRefusedError(data.text())
+    return data.uint(), data.uint(), data.uint()
+
+
+class ClassroomClient:
+    """Connection from a game window to a ClassroomServer.
+
+    A reader thread queues incoming ticks; ``poll`` applies them to the
+    window's mirror GameState on the main thread. ``notify`` is called from
+    the reader thread when a tick arrives (e.g. to wake an idle event loop).
+    """
+
+    def __init__(self, host, port, name, timeout=5.0, notify=None):
+        self._sock = socket.create_connection((host, port), timeout)
+        try:
+            self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._sock.sendall(_hello(name))
+            self._file = self._sock.makefile('rb')
+            self.player_id, self.grid_size, self.tick_ms = _welcome(self._read_frame())
+            self._sock.settimeout(None)
+        except (OSError, ValueError, IndexError):
+            self._sock.close()
+            raise
+        self.roster = {}  # player id -> (name, score, lives, active)
+        self.connected = True
+        self._notify = notify
+        self._inbox = queue.SimpleQueue()
+        threading.Thread(target=self._run, name='classroom', daemon=True).start()
+
+    def _read_frame(self):
+        header = self._file.read(LENGTH.size)
+        if len(header) < LENGTH.size:
+            raise ConnectionError("classroom server closed the connection")
+        (length,) = LENGTH.unpack(header)
+        if length > MAX_BUFFER:
+            # The server drops clients before queueing this much for them
+            raise ConnectionError(f"{length} byte frame from the classroom server")
+        payload = self._file.read(length)
+        if len(payload) < length:
+            raise ConnectionError("classroom server closed the connection")
+        return payload
+
+    def _run(self):
+        try:
+            while True:
+                self._inbox.put(self._read_frame())
+                if self._notify is not None:
+                    self._notify()
+        except (OSError, ConnectionError, ValueError):
+            self.connected = False
+            if self._notify is not None:
+                self._notify()
+
+    def send(self, action):
+        try:
+            self._sock.sendall(frame(bytes((ACTION, ACTION_CODES[action]))))
+        except OSError:
+            self.connected = False
+
+    def poll(self, state):
+        """Apply every tick received so far; returns their events"""
+        events = []
+        while True:
+            try:
+                payload = self._inbox.get_nowait()
+            except queue.Empty:
+                return events
+            if payload[0] == TICK:
+                events += apply_tick(payload, state, self.roster)
+
+    def standing(self):
+        """(rank by score, class size) for this player"""
+        score = self.roster.get(self.player_id, ('', 0))[1]
+        return 1 + sum(entry[1] > score for entry in self.roster.values()), len(self.roster)
+
+    def close(self):
+        # The reader's file keeps the socket open, so shut it down first:
+        # the server sees the player leave (freeing the name) right away
+        try:
+            self._sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._sock.close()
+
+
+async def bot_student(host, port, name, stop, reaction_ms=None):
+    """A scripted student: mirrors its game from ticks and plays it with game.autoplay.Bot"""
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(_hello(name))
+    _, grid_size, tick_ms = _welcome(await _read_frame(reader, MAX_BUFFER))
+    state = core.GameState(grid_size=grid_size)
+    roster = {}
+
+    async def mirror():
+        while True:
+            apply_tick(await _read_frame(reader, MAX_BUFFER), state, roster)
+
+    receiving = asyncio.get_running_loop().create_task(mirror())
+    bot = Bot(reaction_ms if reaction_ms is not None else random.randint(300, 600))
+    start = time.monotonic()
+    try:
+        while not stop.is_set() and not receiving.done():
+            now = int((time.monotonic() - start) * 1000)
+            action = bot.act(state, now) if state.active else core.START
+            if action is not None:
+                writer.write(frame(bytes((ACTION, ACTION_CODES[action]))))
+            await asyncio.sleep(tick_ms / 1000)
+    finally:
+        receiving.cancel()
+        writer.close()
+        await asyncio.gather(receiving, return_exceptions=True)
+
+
+def start_loopback(options=None, bots=3, tick_ms=TICK_MS):
+    """Run a server with ``bots`` bot students on a background thread.
+
+    Returns (server, port); the server listens on 127.0.0.1 only.
+    """
+    server = ClassroomServer(options, tick_ms, profiles=False)
+    started = threading.Event()
+    ports = []
+
+    async def run():
+        listener = await server.serve('127.0.0.1', 0)
+        ports.append(listener.sockets[0].getsockname()[1])
+        started.set()
+        stop = asyncio.Event()
+        await asyncio.gather(*(bot_student('127.0.0.1', ports[0], f'bot{i + 1:02}', stop)
+                               for i in range(bots)))
+
+    threading.Thread(target=asyncio.run, args=(run(),), name='classroom-loopback',
+                     daemon=True).start()
+    started.wait()
+    return server, ports[0]
+
+
+def connect(name, notify=None):
+    """A ClassroomClient for NUMCRUNCH_SERVER=host[:port] or 'loopback', else None.
+
+    A server that can't be reached also gives None, so the game is played locally.
+    """
+    target = os.environ.get('NUMCRUNCH_SERVER')
+    if not target:
+        return None
+    try:
+        if target == 'loopback':
+            _, port = start_loopback()
+            return ClassroomClient('127.0.0.1', port, name, notify=notify)
+        host, _, port = target.partition(':')
+        return ClassroomClient(host, int(port or PORT), name, notify=notify)
+    except (OSError, ValueError, IndexError) as e:
+        print(f"Couldn't join the classroom server {target!r} ({e}); playing locally")
+        return None
+
+
+def tick_report(server, clients, seconds):
+    times = sorted(1000 * t for t in server.tick_times)
+    if not times:
+        return "no ticks"
+    return (f"{clients} clients, {len(times)} ticks: tick {sum(times) / len(times):.3f} ms mean, "
+            f"p95 {times[int(0.95 * (len(times) - 1))]:.3f} ms, max {times[-1]:.3f} ms; "
+            f"{server.bytes_sent / max(clients, 1) / seconds:.0f} B/s per client")
+
+
+async def _loopback(args):
+    server = ClassroomServer(core.board_options(args.grid_size), args.tick_ms, profiles=False)
+    listener = await server.serve('127.0.0.1', 0)
+    port = listener.sockets[0].getsockname()[1]
+    stop = asyncio.Event()
+    bots = [asyncio.create_task(bot_student('127.0.0.1', port, f'bot{i + 1:02}', stop))
+            for i in range(args.clients)]
+    await asyncio.sleep(args.seconds)
+    print(tick_report(server, args.clients, args.seconds))
+    stop.set()
+    await asyncio.gather(*bots, return_exceptions=True)
+    listener.close()
+    server.close()
+    await asyncio.sleep(0.1)  # let the connection handlers see the close
+
+
+async def _serve(args):
+    server = ClassroomServer(core.board_options(args.grid_size), args.tick_ms, scores=open_scores())
+    listener = await server.serve(args.host, args.port)
+    print(f"Classroom server on {args.host}:{args.port} ({server.mode}); Ctrl+C to stop")
+    try:
+        async with listener:
+            while True:
+                await asyncio.sleep(60)
+                print(tick_report(server, len(server.players), 60))
+                server.bytes_sent = 0
+    finally:
+        server.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Host a LAN classroom game")
+    parser.add_argument('command', choices=('serve', 'loopback'))
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--grid-size', type=int, default=core.GRID_SIZE)
+    parser.add_argument('--tick-ms', type=int, default=TICK_MS)
+    parser.add_argument('--clients', type=int, default=30, help="bot students for loopback")
+    parser.add_argument('--seconds', type=float, default=20.0, help="loopback run time")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(_serve(args) if args.command == 'serve' else _loopback(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,356 @@
+"""Headless NumCrunch game rules.
+
+Everything here is free of pygame so games can be stepped and simulated
+without a display or audio device. ``step`` advances a ``GameState`` and
+returns the events (sounds, game over, ...) that the front end should
+react to. Timed rules (enemy moves, feedback expiry, difficulty ramps) run
+from the state's scheduler, so they depend only on ``now`` and never on
+how often ``step`` is called.
+"""
+import random
+from array import array
+
+from game.distractors import generate_distractors, NEAR
+from game.placement import place_answer
+from game.problem_bank import OPERATIONS, format_problem
+from game.enemies import ChaseField, wander_step, spawn_positions
+from game.scheduler import Scheduler
+
+GRID_SIZE = 5
+ENEMY_SPEED = 1500
+START_LIVES = 3
+FEEDBACK_DURATION = 1000
+CORRECT_POINTS = 10
+WRONG_PENALTY = 5
+DISTRACTOR_RANGE = 5
+WANDER_CHANCE = 0.02  # move chance per 60 FPS frame of the wandering enemy
+FRAME_MS = 1000 / 60
+MIN_ENEMY_SPEED = 400
+CELLS_PER_ENEMY = 400  # enemy density on boards bigger than the view
+
+# Actions
+LEFT, RIGHT, UP, DOWN = 'left', 'right', 'up', 'down'
+START = 'start'
+MOVES = {LEFT: (-1, 0), RIGHT: (1, 0), UP: (0, -1), DOWN: (0, 1)}
+
+# Events returned by step()
+EVENT_START = 'start'
+EVENT_CLICK = 'click'
+EVENT_CORRECT = 'correct'
+EVENT_WRONG = 'munch'
+EVENT_HURT = 'hurt'
+EVENT_GAME_OVER = 'game_over'
+
+
+class GameState:
+    """All mutable state of a single game"""
+
+    def __init__(self, grid_size=GRID_SIZE, enemy_speed=ENEMY_SPEED,
+                 distractor_range=DISTRACTOR_RANGE, distractor_strategy=NEAR,
+                 unique_distractors=False, placement='anywhere', view_size=None, wander_chance=None,
+                 ramp_interval=None, ramp_step=100,
+                 enemy_count=1, walls=(), problem_bank=None, difficulty=None,
+                 seed=None, rng=None):
+        self.grid_size = grid_size
+        self.enemy_speed = enemy_speed
+        self.distractor_range = distractor_range
+        self.distractor_strategy = distractor_strategy
+        self.unique_distractors = unique_distractors
+        # Name from game.placement.PLACEMENT_POLICIES or a policy function
+        self.placement = placement
+        # Cells across the player's view, for placements that keep the
+        # answer on screen; None when the whole board is shown
+        self.view_size = view_size
+        # When set, the enemy wanders randomly (like the troggle in src/)
+        # instead of chasing on a timer; the chance is per 60 FPS frame
+        self.wander_chance = wander_chance
+        # When set, the enemy gets ramp_step ms faster every ramp_interval ms
+        self.ramp_interval = ramp_interval
+        self.ramp_step = ramp_step
+        self.start_enemy_speed = enemy_speed
+        self.scheduler = Scheduler()
+        self._feedback_expiry = None
+        # Optional game.problem_bank.ProblemBank to draw division facts from,
+        # limited to one difficulty tier when ``difficulty`` is set
+        self.problem_bank = problem_bank
+        self.difficulty = difficulty
+        self.enemy_count = enemy_count
+        self.walls = frozenset(tuple(cell) for cell in walls)
+        self.chase = ChaseField(grid_size, self.walls)
+        self.rng = rng if rng is not None else random.Random(seed)
+        self.player_pos = self.start_pos()
+        self.enemies = [[0, 0]]
+        self.grid_values = array('i')  # row-major, one C int per cell
+        self.current_problem = ""
+        self.correct_answer = 0
+        self.score = 0
+        self.lives = START_LIVES
+        self.active = False
+        self.feedback = None  # (message, kind) where kind is 'correct' or 'wrong'
+        self.feedback_time = 0
+        self.last_enemy_move = 0
+        self.problem_time = 0  # when the current problem appeared
+        # Optional callback given an answer_record() for every answer, e.g.
+        # game.telemetry.TelemetryWriter.log
+        self.on_answer = None
+        # Optional game.mastery.FactScheduler picking problems for the
+        # student instead of drawing them uniformly
+        self.facts = None
+        # Optional callback given a game_record() when a game ends, e.g.
+        # game.scores.ScoreStore.add
+        self.on_game_over = None
+        self.started_at = 0
+
+    def start_pos(self):
+        return [self.grid_size // 2, self.grid_size // 2]
+
+    @property
+    def enemy_pos(self):
+        """Position of the first enemy"""
+        return self.enemies[0]
+
+    @enemy_pos.setter
+    def enemy_pos(self, pos):
+        self.enemies[0] = pos
+
+    def blocked_cells(self):
+        """Walls plus cells holding an enemy"""
+        return self.walls | {tuple(pos) for pos in self.enemies}
+
+    @property
+    def game_over(self):
+        return not self.active and self.lives <= 0
+
+    def feedback_visible(self, now):
+        return self.feedback is not None and now < self.feedback_time
+
+
+def board_options(grid_size=GRID_SIZE, view_size=GRID_SIZE):
+    """GameState options for a ``grid_size`` board shown ``view_size`` cells across.
+
+    Boards bigger than the view keep the answer near the player, so it is
+    always on screen, and get more enemies.
+    """
+    if grid_size <= view_size:
+        return {'grid_size': grid_size}
+    return {'grid_size': grid_size, 'placement': 'nearby', 'view_size': view_size,
+            'enemy_count': max(1, grid_size * grid_size // CELLS_PER_ENEMY)}
+
+
+def generate_problem(rng=random, bank=None, tier=None, facts=None):
+    """Return (problem text, answer, operands); operands are (a, b, symbol)
+    for distractors that mimic times-table slips"""
+    if facts is not None:
+        operation, a, b, answer = facts.next(rng)
+    elif bank is not None:
+        operation, a, b, answer = bank.draw_raw(rng, 'division', tier)
+    else:
+        b = rng.randint(2, 12)
+        answer = rng.randint(2, 12)
+        operation, a = 'division', b * answer
+    return f"{format_problem(operation, a, b)} = ?", answer, (a, b, OPERATIONS[operation].symbol)
+
+
+def generate_grid(state):
+    rng = state.rng
+    size = state.grid_size
+    state.current_problem, state.correct_answer, operands = generate_problem(
+        rng, state.problem_bank, state.difficulty, state.facts)
+    correct_answer = state.correct_answer
+    correct_row, correct_col = place_answer(state.placement, size, rng,
+                                            state.player_pos, state.blocked_cells(), state.view_size)
+    grid_values = generate_distractors(rng, correct_answer, size * size - 1,
+                                       state.distractor_range, state.unique_distractors,
+                                       state.distractor_strategy, operands)
+    grid_values.insert(correct_row * size + correct_col, correct_answer)
+    state.grid_values = array('i', grid_values)
+
+
+def show_feedback(state, message, kind, now):
+    state.feedback = (message, kind)
+    state.feedback_time = now + FEEDBACK_DURATION
+    state.scheduler.cancel(state._feedback_expiry)
+    state._feedback_expiry = state.scheduler.schedule(state.feedback_time, expire_feedback, state)
+
+
+def expire_feedback(state, now):
+    state.feedback = None
+    state._feedback_expiry = None
+
+
+def enemy_tick(state, now):
+    # Reschedule first so end_game() can clear it
+    state.scheduler.schedule(now + state.enemy_speed, enemy_tick, state)
+    state.last_enemy_move = now
+    return move_enemy(state, now)
+
+
+def wander_tick(state, now):
+    schedule_wander(state, now)
+    return wander_enemy(state, now)
+
+
+def schedule_wander(state, now):
+    # Moves arrive as a Poisson process with the same average rate as a
+    # per-frame coin flip at 60 FPS, independent of the real frame rate
+    rate = state.wander_chance / FRAME_MS
+    state.scheduler.schedule(now + state.rng.expovariate(rate), wander_tick, state)
+
+
+def ramp_tick(state, now):
+    state.scheduler.schedule(now + state.ramp_interval, ramp_tick, state)
+    state.enemy_speed = max(MIN_ENEMY_SPEED, state.enemy_speed - state.ramp_step)
+
+
+def start_game(state, now):
+    state.player_pos = state.start_pos()
+    avoid = state.walls | {tuple(state.player_pos)}
+    state.enemies = spawn_positions(state.grid_size, state.enemy_count, state.rng, avoid)
+    state.score = 0
+    state.lives = START_LIVES
+    state.active = True
+    state.feedback = None
+    state.feedback_time = 0
+    state.last_enemy_move = now
+    state.started_at = now
+    state.enemy_speed = state.start_enemy_speed
+    generate_grid(state)
+    state.problem_time = now
+
+    state.scheduler.clear()
+    if state.wander_chance is not None:
+        schedule_wander(state, now)
+    else:
+        state.scheduler.schedule(now + state.enemy_speed, enemy_tick, state)
+    if state.ramp_interval:
+        state.scheduler.schedule(now + state.ramp_interval, ramp_tick, state)
+    return [EVENT_START]
+
+
+def end_game(state, now):
+    state.active = False
+    state.scheduler.clear()
+    if state.on_game_over is not None:
+        state.on_game_over(game_record(state, now))
+    return [EVENT_GAME_OVER]
+
+
+def game_record(state, now):
+    """How the game that just ended went"""
+    return {
+        'score': state.score,
+        'duration_ms': now - state.started_at,
+        'difficulty': state.difficulty,
+        'grid_size': state.grid_size,
+    }
+
+
+def move_player(state, action, now):
+    dx, dy = MOVES[action]
+    new_x, new_y = state.player_pos[0] + dx, state.player_pos[1] + dy
+    if not (0 <= new_x < state.grid_size and 0 <= new_y < state.grid_size):
+        return []
+    if (new_x, new_y) in state.walls:
+        return []
+
+    state.player_pos = [new_x, new_y]
+    events = [EVENT_CLICK]
+    chosen = state.grid_values[new_y * state.grid_size + new_x]
+    if chosen == state.correct_answer:
+        state.score += CORRECT_POINTS
+        show_feedback(state, f"Correct! +{CORRECT_POINTS}", 'correct', now)
+        events.append(EVENT_CORRECT)
+        record_answer(state, chosen, now)
+        generate_grid(state)
+        state.problem_time = now
+    else:
+        state.score = max(0, state.score - WRONG_PENALTY)
+        show_feedback(state, f"Wrong! -{WRONG_PENALTY}", 'wrong', now)
+        events.append(EVENT_WRONG)
+        record_answer(state, chosen, now)
+    return events
+
+
+def record_answer(state, chosen, now):
+    if state.facts is not None:
+        state.facts.answer(chosen == state.correct_answer, now - state.problem_time)
+    if state.on_answer is not None:
+        state.on_answer(answer_record(state, chosen, now))
+
+
+def answer_record(state, chosen, now):
+    """What happened when the player picked ``chosen`` for the current problem"""
+    x, y = state.player_pos
+    return {
+        'at': now,
+        'problem': state.current_problem,
+        'answer': state.correct_answer,
+        'chosen': chosen,
+        'correct': chosen == state.correct_answer,
+        'latency_ms': now - state.problem_time,
+        'lives': state.lives,
+        'score': state.score,
+        'enemy_distance': min(abs(ex - x) + abs(ey - y) for ex, ey in state.enemies),
+    }
+
+
+def move_enemy(state, now):
+    # One distance field toward the player, shared by every enemy
+    state.chase.update(state.player_pos)
+    occupied = {tuple(pos) for pos in state.enemies}
+    for i, pos in enumerate(state.enemies):
+        occupied.discard(tuple(pos))
+        state.enemies[i] = state.chase.step(pos, state.rng, occupied)
+        occupied.add(tuple(state.enemies[i]))
+    return check_collision(state, now)
+
+
+def wander_enemy(state, now):
+    state.enemies = [wander_step(state.grid_size, pos, state.rng, state.walls)
+                     for pos in state.enemies]
+    return check_collision(state, now)
+
+
+def check_collision(state, now):
+    events = []
+    if state.player_pos in state.enemies:
+        state.lives -= 1
+        show_feedback(state, "OUCH! -1 Life", 'wrong', now)
+        events.append(EVENT_HURT)
+        state.player_pos = state.start_pos()
+        if state.lives <= 0:
+            events += end_game(state, now)
+    return events
+
+
+def step(state, action, now):
+    """Run timed events due by ``now`` (in ms), then apply one action (or None).
+
+    Mutates ``state`` in place and returns the list of events that happened.
+    Any action starts a new game while no game is running. Because events
+    due before an action always run first, the outcome depends only on when
+    actions happen, not on how often ``step`` is called in between, which
+    is what makes replays deterministic.
+    """
+    events = state.scheduler.run_due(now) if state.active else []
+    if not state.active:
+        return events + start_game(state, now) if action is not None else events
+    if action in MOVES:
+        events += move_player(state, action, now)
+    return events
+
+
+def simulate(state, actions, start=0, dt=1000 // 60):
+    """Feed an iterable of actions to ``step`` one tick of ``dt`` ms apart.
+
+    Returns the number of ticks run; stops early once the game is over.
+    """
+    now = start
+    ticks = 0
+    for action in actions:
+        step(state, action, now)
+        ticks += 1
+        now += dt
+        if state.game_over:
+            break
+    return ticks
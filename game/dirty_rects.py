@@ -0,0 +1,63 @@
+"""Opt-in dirty-rectangle rendering.
+
+Instead of redrawing and flipping the whole window every frame, the loop
+reports the state of each on-screen element with ``track``. Only regions
+whose state changed since the last frame are redrawn and pushed to the
+display with ``pygame.display.update(rects)``. When nothing changed the
+frame is skipped entirely. When ``screen`` is an offscreen frame, pass the
+``game.display.ScaledDisplay`` that shows it as ``output``.
+"""
+import os
+
+import pygame
+
+
+def dirty_rects_enabled():
+    """Dirty-rect mode is enabled with NUMCRUNCH_DIRTY_RECTS=1"""
+    return os.environ.get('NUMCRUNCH_DIRTY_RECTS', '0') == '1'
+
+
+class DirtyRectRenderer:
+    def __init__(self, screen, enabled=True, output=None):
+        self.screen = screen
+        self.output = output
+        self.enabled = enabled
+        self._states = {}
+        self._dirty = []
+        self._full = True
+
+    def track(self, name, rect, state):
+        """Record an element's rect and state; mark it dirty if either changed"""
+        rect = pygame.Rect(rect)
+        previous = self._states.get(name)
+        if previous is None:
+            self._dirty.append(rect)
+        elif previous[1] != state or previous[0] != rect:
+            self._dirty.append(previous[0])
+            self._dirty.append(rect)
+        self._states[name] = (rect, state)
+
+    def mark(self, rect):
+        self._dirty.append(pygame.Rect(rect))
+
+    def mark_full(self):
+        self._full = True
+
+    def begin_frame(self):
+        """Return True if this frame needs drawing and clip to the dirty area"""
+        if not self.enabled or self._full:
+            self.screen.set_clip(None)
+            return True
+        if not self._dirty:
+            return False
+        self.screen.set_clip(self._dirty[0].unionall(self._dirty[1:]))
+        return True
+
+    def present(self):
+        self.screen.set_clip(None)
+        if not self.enabled or self._full:
+            self.output.present() if self.output else pygame.display.flip()
+        elif self._dirty:
+            self.output.present(self._dirty) if self.output else pygame.display.update(self._dirty)
+        self._dirty = []
+        self._full = False
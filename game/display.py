@@ -0,0 +1,76 @@
+"""Logical-resolution display.
+
+The game always draws to an 800x600 surface, ``surface``. When the window
+has a different size, ``present`` copies that frame to the window once,
+scaled to the largest size that keeps the aspect ratio, with black bars
+filling the rest; at 800x600 ``surface`` is part of the window itself and
+nothing is copied. So a 4K panel or a projector costs one scale per frame,
+not a bigger blit for every sprite, and assets stay baked at their logical
+size. Scaling is nearest-neighbour (fast) by default
+or smooth with NUMCRUNCH_SCALING=smooth. NUMCRUNCH_WINDOW=WIDTHxHEIGHT sets
+the starting window size, and NUMCRUNCH_FULLSCREEN=1 uses the whole screen.
+"""
+import math
+import os
+
+import pygame
+
+
+def display_options(logical_size):
+    """(window size, fullscreen, smooth) from the environment"""
+    window = os.environ.get('NUMCRUNCH_WINDOW')
+    size = tuple(int(n) for n in window.lower().split('x')) if window else logical_size
+    fullscreen = os.environ.get('NUMCRUNCH_FULLSCREEN', '0') == '1'
+    smooth = os.environ.get('NUMCRUNCH_SCALING', 'nearest') == 'smooth'
+    return size, fullscreen, smooth
+
+
+class ScaledDisplay:
+    def __init__(self, logical_size, window_size=None, fullscreen=False, smooth=False):
+        self.logical_size = tuple(logical_size)
+        self.smooth = smooth
+        if fullscreen:
+            pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
+        else:
+            pygame.display.set_mode(window_size or self.logical_size, pygame.RESIZABLE)
+        self.surface = self._frame = None
+        self.resize()
+
+    def resize(self):
+        """Fit the frame to the current window size; call after VIDEORESIZE.
+
+        ``surface`` may be replaced, so callers drawing to it must fetch it again.
+        """
+        self.window = pygame.display.get_surface()
+        width, height = self.window.get_size()
+        self.scale = min(width / self.logical_size[0], height / self.logical_size[1])
+        self.target = pygame.Rect(0, 0, round(self.logical_size[0] * self.scale),
+                                  round(self.logical_size[1] * self.scale))
+        self.target.center = self.window.get_rect().center
+        self.scaled = self.target.size != self.logical_size
+        self.window.fill((0, 0, 0))
+        if not self.scaled:
+            self.surface = self.window.subsurface(self.target)
+        else:
+            if self._frame is None:
+                self._frame = pygame.Surface(self.logical_size).convert()
+            self.surface = self._frame
+
+    def to_window(self, rect):
+        """Window rect covering logical ``rect``"""
+        rect = pygame.Rect(rect)
+        left = self.target.x + math.floor(rect.left * self.scale)
+        top = self.target.y + math.floor(rect.top * self.scale)
+        right = self.target.x + math.ceil(rect.right * self.scale)
+        bottom = self.target.y + math.ceil(rect.bottom * self.scale)
+        return pygame.Rect(left, top, right - left, bottom - top).clip(self.target)
+
+    def present(self, rects=None):
+        """Show the frame; ``rects`` limits the update to the logical areas that changed"""
+        if self.scaled:
+            scale = pygame.transform.smoothscale if self.smooth else pygame.transform.scale
+            scale(self.surface, self.target.size, self.window.subsurface(self.target))
+        if rects is None:
+            pygame.display.flip()
+        else:
+            pygame.display.update([self.to_window(rect) for rect in rects])
@@ -0,0 +1,69 @@
+"""Wrong-answer generation for the grid.
+
+Distractors are drawn from a precomputed pool of valid wrong answers in a
+single call, so there is no retry loop and the cost stays flat as the grid
+grows.
+"""
+from functools import lru_cache
+
+NEAR = 'near'
+TIMES_TABLE = 'times_table'
+
+
+@lru_cache(maxsize=1024)
+def near_pool(answer, spread):
+    """All positive values within ``spread`` of ``answer``, except the answer"""
+    return tuple(v for v in range(max(1, answer - spread), answer + spread + 1) if v != answer)
+
+
+def times_table_mistakes(answer, operands=None):
+    """Wrong answers a student is likely to give.
+
+    Off by one or two, digits swapped, and, when the operands of a
+    multiplication or division are known, the neighbouring times-table
+    entries.
+    """
+    mistakes = [answer - 2, answer - 1, answer + 1, answer + 2]
+    if answer >= 10 and answer % 10:
+        mistakes.append(int(str(answer)[::-1]))
+    if operands is not None:
+        a, b, symbol = operands
+        if symbol == '×':
+            mistakes += [a * (b - 1), a * (b + 1), (a - 1) * b, (a + 1) * b]
+        elif symbol == '÷':
+            mistakes += [a // d for d in (b - 1, b + 1) if d > 0 and a % d == 0]
+    return tuple(dict.fromkeys(m for m in mistakes if m > 0 and m != answer))
+
+
+def generate_distractors(rng, answer, count, spread=5, unique=False,
+                         strategy=NEAR, operands=None):
+    """Return ``count`` wrong answers for ``answer``.
+
+    With ``unique`` no value repeats; the pool is widened when the grid is
+    bigger than the number of values within ``spread``. The times-table
+    strategy favours plausible mistakes and fills up with near values.
+    """
+    pool = near_pool(answer, spread)
+    plausible = ()
+    if strategy == TIMES_TABLE:
+        plausible = times_table_mistakes(answer, operands)
+    elif strategy != NEAR:
+        raise ValueError(f"unknown distractor strategy: {strategy}")
+
+    if not unique:
+        # Plausible mistakes appear twice as often as plain near values
+        return rng.choices(plausible + plausible + pool if plausible else pool, k=count)
+
+    picked = rng.sample(plausible, min(count, len(plausible)))
+    needed = count - len(picked)
+    if needed:
+        taken = set(picked)
+        rest = [v for v in pool if v not in taken]
+        # Widen the pool upward when the grid outgrows it
+        value = max(pool + plausible, default=answer) + 1
+        while len(rest) < needed:
+            if value not in taken:
+                rest.append(value)
+            value += 1
+        picked += rng.sample(rest, needed)
+    return picked
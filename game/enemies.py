@@ -0,0 +1,93 @@
+"""Enemy movement for any number of enemies.
+
+A single BFS distance field toward the player is computed whenever the
+player moves and is shared by every enemy; each enemy then just steps to a
+neighbouring cell that is closer. Blocked cells (walls) are respected by
+both the search and the moves.
+"""
+from collections import deque
+
+UNREACHABLE = -1
+STEPS = ((-1, 0), (1, 0), (0, -1), (0, 1))
+
+
+def distance_field(grid_size, target, blocked=frozenset()):
+    """BFS distance from every cell to ``target``, indexed by y * size + x"""
+    size = grid_size
+    dist = [UNREACHABLE] * (size * size)
+    tx, ty = target
+    dist[ty * size + tx] = 0
+    queue = deque([(tx, ty)])
+    while queue:
+        x, y = queue.popleft()
+        next_dist = dist[y * size + x] + 1
+        for dx, dy in STEPS:
+            nx, ny = x + dx, y + dy
+            if (0 <= nx < size and 0 <= ny < size and dist[ny * size + nx] == UNREACHABLE
+                    and (nx, ny) not in blocked):
+                dist[ny * size + nx] = next_dist
+                queue.append((nx, ny))
+    return dist
+
+
+class ChaseField:
+    """Distance field toward a target, recomputed only when the target moves"""
+
+    def __init__(self, grid_size, blocked=frozenset()):
+        self.grid_size = grid_size
+        self.blocked = frozenset(blocked)
+        self.target = None
+        self.dist = None
+        self.computations = 0
+
+    def update(self, target):
+        target = tuple(target)
+        if target != self.target:
+            self.dist = distance_field(self.grid_size, target, self.blocked)
+            self.target = target
+            self.computations += 1
+
+    def step(self, pos, rng, occupied=()):
+        """Return the cell an enemy at ``pos`` moves to.
+
+        Picks randomly among neighbours that are closer to the target and not
+        in ``occupied``; stays put if there are none.
+        """
+        size, dist = self.grid_size, self.dist
+        x, y = pos
+        here = dist[y * size + x]
+        if here == UNREACHABLE:
+            return [x, y]
+        closer = []
+        for dx, dy in STEPS:
+            nx, ny = x + dx, y + dy
+            if (0 <= nx < size and 0 <= ny < size
+                    and UNREACHABLE < dist[ny * size + nx] < here
+                    and (nx, ny) not in occupied):
+                closer.append([nx, ny])
+        return rng.choice(closer) if closer else [x, y]
+
+
+def wander_step(grid_size, pos, rng, blocked=frozenset()):
+    """One random step, staying put when it would leave the grid or hit a wall"""
+    dx, dy = rng.choice(STEPS)
+    nx, ny = pos[0] + dx, pos[1] + dy
+    if 0 <= nx < grid_size and 0 <= ny < grid_size and (nx, ny) not in blocked:
+        return [nx, ny]
+    return list(pos)
+
+
+def spawn_positions(grid_size, count, rng, avoid=frozenset()):
+    """Start cells for ``count`` enemies: the corners first, then random free cells"""
+    last = grid_size - 1
+    corners = [(0, 0), (last, last), (last, 0), (0, last)]
+    positions = [cell for cell in corners if cell not in avoid][:count]
+    taken = set(avoid) | set(positions)
+    free = grid_size * grid_size - len(taken)
+    while len(positions) < count and free > 0:
+        cell = (rng.randrange(grid_size), rng.randrange(grid_size))
+        if cell not in taken:
+            positions.append(cell)
+            taken.add(cell)
+            free -= 1
+    return [list(cell) for cell in positions]
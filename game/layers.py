@@ -0,0 +1,82 @@
+"""Pre-composited render layers.
+
+The grid only changes when a new problem is generated, so the background,
+cell backgrounds, borders and numbers are baked into one surface that is
+blitted once per frame instead of being rebuilt cell by cell.
+"""
+from functools import lru_cache
+
+import pygame
+
+from game.text_cache import render_text
+
+
+@lru_cache(maxsize=16)
+def solid_overlay(size, color):
+    """Return a shared translucent surface of the given size and RGBA color"""
+    overlay = pygame.Surface(size, pygame.SRCALPHA)
+    overlay.fill(color)
+    return overlay
+
+
+class GridLayer:
+    """Background plus grid baked into a single screen-sized surface"""
+
+    def __init__(self, font, grid_size, cell_size, offset, cell_color,
+                 border_color, text_color, highlight_color=None):
+        self.font = font
+        self.grid_size = grid_size
+        self.cell_size = cell_size
+        self.offset = offset
+        self.cell_color = cell_color
+        self.border_color = border_color
+        self.text_color = text_color
+        self.highlight_color = highlight_color
+        self.rebuilds = 0
+        self.hits = 0
+        self._key = None
+        self._surface = None
+
+    def invalidate(self):
+        self._key = None
+
+    def get(self, background, grid_values, correct_answer, screen_size):
+        """Return the layer, rebuilding it only if its inputs changed.
+
+        ``background`` is either a surface or a fill color.
+        """
+        key = (tuple(grid_values), correct_answer, tuple(screen_size), id(background))
+        if key != self._key:
+            self._surface = self._build(background, grid_values, correct_answer, screen_size)
+            self._key = key
+            self.rebuilds += 1
+        else:
+            self.hits += 1
+        return self._surface
+
+    def _build(self, background, grid_values, correct_answer, screen_size):
+        layer = pygame.Surface(screen_size)
+        if pygame.display.get_surface() is not None:
+            layer = layer.convert()
+        if isinstance(background, pygame.Surface):
+            layer.blit(background, (0, 0))
+        else:
+            layer.fill(background)
+
+        size = self.cell_size
+        cell = solid_overlay((size, size), self.cell_color)
+        offset_x, offset_y = self.offset
+        for row in range(self.grid_size):
+            for col in range(self.grid_size):
+                x = offset_x + col * size
+                y = offset_y + row * size
+                layer.blit(cell, (x, y))
+                pygame.draw.rect(layer, self.border_color, (x, y, size, size), 2)
+
+                value = grid_values[row * self.grid_size + col]
+                color = self.text_color
+                if self.highlight_color is not None and value == correct_answer:
+                    color = self.highlight_color
+                text = render_text(self.font, value, color)
+                layer.blit(text, text.get_rect(center=(x + size//2, y + size//2)))
+        return layer
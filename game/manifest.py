@@ -0,0 +1,135 @@
+"""Asset manifest.
+
+Maps logical asset names ('crunch', 'victory', 'player', ...) to the file
+that provides them, with its size, hash and a quick hash of its ends. The manifest is generated from
+game/assets when the package is built (and can be regenerated with
+``python -m game.manifest``), so the game reads one small JSON file at
+startup instead of probing candidate filenames. Assets are opened through
+importlib.resources so they also work from an installed or zipped package.
+"""
+import hashlib
+import json
+from contextlib import contextmanager
+from importlib import resources
+from pathlib import Path
+
+MANIFEST_VERSION = 3
+MANIFEST_NAME = 'manifest.json'
+ASSETS_DIR = Path(__file__).parent / 'assets'
+PROBE_BYTES = 4096  # read from each end of a file for its quick hash
+
+# Logical name -> candidate files under assets/, in order of preference
+ASSET_CANDIDATES = {
+    'hurt': ['sounds/386893__samueleunimancer__ouch-screem.wav'],
+    'click': ['sounds/click.wav'],
+    'correct': ['sounds/correct.wav'],
+    'crunch': ['sounds/crunch.wav', 'sounds/munch.wav', 'sounds/bite.wav'],
+    'victory': ['sounds/victory.flac', 'sounds/success.wav', 'sounds/win.flac',
+                'sounds/celebration.wav'],
+    'music': ['sounds/background.wav', 'sounds/background_music.wav', 'sounds/music.mp3'],
+    'background': ['images/background.png', 'images/classroom.png'],
+    'player': ['images/player.png', 'images/cruncher.png'],
+    'enemy': ['images/enemy.png', 'images/troublemaker.png'],
+}
+
+
+def _probe(data, size):
+    return hashlib.sha1(b'%d' % size + data).hexdigest()[:16]
+
+
+def probe_hash(path):
+    """Hash of a file's size and first and last PROBE_BYTES, without reading the rest"""
+    with open(path, 'rb') as f:
+        size = f.seek(0, 2)
+        f.seek(0)
+        head = f.read(PROBE_BYTES)
+        f.seek(max(size - PROBE_BYTES, 0))
+        return _probe(head + f.read(PROBE_BYTES), size)
+
+
+def build_manifest(assets_dir=ASSETS_DIR):
+    """Resolve every logical asset against ``assets_dir``"""
+    assets = {}
+    for name, candidates in ASSET_CANDIDATES.items():
+        for candidate in candidates:
+            path = Path(assets_dir) / candidate
+            if path.is_file():
+                data = path.read_bytes()
+                assets[name] = {
+                    'file': candidate,
+                    'size': len(data),
+                    'probe': _probe(data[:PROBE_BYTES] + data[-PROBE_BYTES:], len(data)),
+                    'sha1': hashlib.sha1(data).hexdigest()[:16],
+                }
+                break
+    return {'version': MANIFEST_VERSION, 'assets': assets}
+
+
+def write_manifest(assets_dir=ASSETS_DIR):
+    path = Path(assets_dir) / MANIFEST_NAME
+    manifest = build_manifest(assets_dir)
+    path.write_text(json.dumps(manifest, indent=2, sort_keys=True) + '\n')
+    return path, manifest
+
+
+_manifest = None
+
+
+def load_manifest():
+    """Read the packaged manifest once; build one in memory if it is missing"""
+    global _manifest
+    if _manifest is None:
+        try:
+            text = resources.files('game').joinpath('assets', MANIFEST_NAME).read_text()
+            _manifest = json.loads(text)
+            if _manifest.get('version') != MANIFEST_VERSION:
+                raise ValueError("outdated asset manifest")
+        except (OSError, ValueError):
+            _manifest = build_manifest()
+    return _manifest
+
+
+def asset_entry(name):
+    """Manifest entry for ``name`` ({'file', 'size', 'probe', 'sha1'}), or None if not shipped"""
+    return load_manifest()['assets'].get(name)
+
+
+def asset_digest(name, path):
+    """The manifest's hash of ``name`` if ``path`` still has the size and
+    quick hash it was built from, else None so the caller hashes the file itself.
+
+    Only the ends of the file are read, so this holds on a fresh clone or
+    install (where modification times differ) while still catching an
+    asset edited without rebuilding the manifest.
+    """
+    entry = asset_entry(name)
+    if entry is None:
+        return None
+    try:
+        probe = probe_hash(path)
+    except (OSError, TypeError):
+        return None
+    return entry['sha1'] if probe == entry.get('probe') else None
+
+
+@contextmanager
+def asset_file(name):
+    """Yield a real filesystem path for ``name``, or None if it is not shipped.
+
+    Assets inside a zipped package are extracted to a temporary file.
+    """
+    entry = asset_entry(name)
+    if entry is None:
+        yield None
+        return
+    resource = resources.files('game').joinpath('assets', *entry['file'].split('/'))
+    with resources.as_file(resource) as path:
+        yield path
+
+
+if __name__ == '__main__':
+    path, manifest = write_manifest()
+    for name in ASSET_CANDIDATES:
+        entry = manifest['assets'].get(name)
+        print(f"{name}: {entry['file']} ({entry['size']} bytes)" if entry else f"{name}: missing")
+    print(f"Wrote {path}")
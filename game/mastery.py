@@ -0,0 +1,242 @@
+"""Per-student fact mastery and spaced-repetition problem selection.
+
+A ``MasteryProfile`` keeps, for every arithmetic fact a student has met,
+a Leitner box, how often they answered it (and how often correctly), and a
+running average of the time to the right answer. A ``FactScheduler`` picks
+the next problem from that profile instead of drawing uniformly:
+
+* facts live in a heap ordered by when they are due (weakest box, then
+  slowest, first on ties), so picking and rescheduling are O(log n);
+* a fact that is due is reviewed; otherwise an unseen fact is introduced,
+  and once every fact has been seen the one due soonest comes early. Every
+  NEW_FACT_EVERY-th problem is a new fact regardless, so a few stubborn
+  facts can't crowd out the rest of the table;
+* answering right first time within FLUENT_MS moves a fact up a box, any
+  wrong answer drops it to box 0, and the box decides how many problems
+  later it comes back (INTERVALS).
+
+Time is counted in problems presented, not wall-clock time, so selection is
+deterministic for a given profile and RNG (which keeps replays exact).
+
+Profiles are small binary files, one per student, in <data dir>/students/
+(a full profile over every bank fact is ~14 KB); only the profile of the
+student playing is read. NUMCRUNCH_STUDENT names the student (the OS user
+by default) and NUMCRUNCH_MASTERY=0 turns adaptive selection off.
+
+    python -m game.mastery [student]    # accuracy and weakest facts
+"""
+import getpass
+import heapq
+import os
+import re
+import struct
+import sys
+from pathlib import Path
+
+from game.paths import data_dir
+from game.problem_bank import OPERATIONS, format_problem, load_bank
+
+MAGIC = b'NCMS'
+VERSION = 1
+HEADER = struct.Struct('<BIH')        # version, problems presented, fact count
+RECORD = struct.Struct('<BhhBHHHI')   # op code, a, b, box, attempts, correct, latency ms, due
+
+INTERVALS = (3, 6, 15, 40, 100, 250)  # problems until a fact in each box is due again
+FLUENT_MS = 6000  # slower right answers keep their box
+NEW_FACT_EVERY = 4
+MAX_LATENCY = 0xffff
+
+# Fields of a profile's per-fact stats lists
+BOX, ATTEMPTS, CORRECT, LATENCY, DUE = range(5)
+
+_OPERATION_NAMES = {op.code: name for name, op in OPERATIONS.items()}
+
+
+class MasteryProfile:
+    def __init__(self, student, path=None, clock=0, stats=None):
+        self.student = student
+        self.path = path
+        self.clock = clock  # problems presented so far
+        # (op code, a, b) -> [box, attempts, correct, latency ms, due]
+        self.stats = stats if stats is not None else {}
+        self.dirty = False
+
+    @classmethod
+    def from_bytes(cls, data, student=None, path=None):
+        if data[:4] != MAGIC:
+            raise ValueError("not a NumCrunch mastery profile")
+        version, clock, count = HEADER.unpack_from(data, 4)
+        if version != VERSION:
+            raise ValueError(f"unsupported mastery profile version {version}")
+        stats = {}
+        for code, a, b, *fields in RECORD.iter_unpack(
+                data[4 + HEADER.size:4 + HEADER.size + count * RECORD.size]):
+            stats[code, a, b] = fields
+        return cls(student, path, clock, stats)
+
+    @classmethod
+    def load(cls, path, student=None):
+        """The profile at ``path``; a new one if it is missing or unreadable"""
+        try:
+            return cls.from_bytes(Path(path).read_bytes(), student, path)
+        except (OSError, ValueError, struct.error):
+            return cls(student, path)
+
+    def to_bytes(self):
+        records = b''.join(RECORD.pack(*key, *fields) for key, fields in self.stats.items())
+        return MAGIC + HEADER.pack(VERSION, self.clock, len(self.stats)) + records
+
+    def save(self):
+        """Write the profile atomically if it changed since it was loaded"""
+        if self.path is None or not self.dirty:
+            return
+        path = Path(self.path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix('.tmp')
+        tmp_path.write_bytes(self.to_bytes())
+        os.replace(tmp_path, path)
+        self.dirty = False
+
+    def weakest(self, count=10):
+        """The ``count`` weakest facts as (problem text, stats), lowest box first"""
+        ranked = sorted(self.stats.items(), key=lambda item: (
+            item[1][BOX], item[1][CORRECT] / max(item[1][ATTEMPTS], 1), -item[1][LATENCY]))
+        return [(format_problem(_OPERATION_NAMES[code], a, b), fields)
+                for (code, a, b), fields in ranked[:count]]
+
+
+class FactScheduler:
+    """Chooses problems from ``bank`` (filtered by operation and tier) for one profile.
+
+    ``keep(a, b, answer)``, if given, narrows the facts further.
+    """
+
+    def __init__(self, profile, bank=None, operation=None, tier=None, keep=None):
+        self.profile = profile
+        self.bank = bank if bank is not None else load_bank()
+        self._heap = []
+        self._unseen = []
+        for span in self.bank.facts(operation, tier):
+            for index in span:
+                if keep is not None and not keep(*self.bank.fact(index)[1:]):
+                    continue
+                stats = profile.stats.get(self._key(index))
+                if stats is None:
+                    self._unseen.append(index)
+                else:
+                    self._heap.append(self._entry(stats, index))
+        if not self._heap and not self._unseen:
+            raise KeyError(f"no {operation or 'problems'} in tier {tier}")
+        heapq.heapify(self._heap)
+        self._current = None  # bank index of the problem on screen
+        self._failed = False
+
+    def _key(self, index):
+        operation, a, b, _ = self.bank.fact(index)
+        return OPERATIONS[operation].code, a, b
+
+    @staticmethod
+    def _entry(stats, index):
+        return stats[DUE], stats[BOX], -stats[LATENCY], index
+
+    def next(self, rng):
+        """Present the next fact; returns (operation, a, b, answer)"""
+        self._requeue()
+        self.profile.clock += 1
+        self.profile.dirty = True
+        clock = self.profile.clock
+        review = self._heap and self._heap[0][0] <= clock and clock % NEW_FACT_EVERY
+        if review or not self._unseen:
+            index = heapq.heappop(self._heap)[-1]
+        else:
+            # Swap-remove keeps introducing a random unseen fact O(1)
+            i = rng.randrange(len(self._unseen))
+            self._unseen[i], self._unseen[-1] = self._unseen[-1], self._unseen[i]
+            index = self._unseen.pop()
+        self._current = index
+        self._failed = False
+        return self.bank.fact(index)
+
+    def answer(self, correct, latency_ms):
+        """Record an answer to the current fact; a right one reschedules it"""
+        if self._current is None:
+            return
+        stats = self.profile.stats.setdefault(self._key(self._current), [0, 0, 0, 0, 0])
+        stats[ATTEMPTS] = min(stats[ATTEMPTS] + 1, 0xffff)
+        if not correct:
+            self._failed = True
+            stats[BOX] = 0
+            stats[DUE] = self.profile.clock + INTERVALS[0]
+            return
+        latency_ms = min(max(int(latency_ms), 0), MAX_LATENCY)
+        stats[LATENCY] = latency_ms if not stats[CORRECT] else (3 * stats[LATENCY] + latency_ms) // 4
+        stats[CORRECT] = min(stats[CORRECT] + 1, 0xffff)
+        if not self._failed and latency_ms <= FLUENT_MS:
+            stats[BOX] = min(stats[BOX] + 1, len(INTERVALS) - 1)
+        stats[DUE] = self.profile.clock + INTERVALS[stats[BOX]]
+        heapq.heappush(self._heap, self._entry(stats, self._current))
+        self._current = None
+
+    def _requeue(self):
+        # A problem left unanswered (the game ended) goes back where it came from
+        index, self._current = self._current, None
+        if index is None:
+            return
+        stats = self.profile.stats.get(self._key(index))
+        if stats is None:
+            self._unseen.append(index)
+        else:
+            heapq.heappush(self._heap, self._entry(stats, index))
+
+
+def classic_division(a, b, answer):
+    """The facts core.generate_problem asks without a bank: divisor and answer 2..12"""
+    return b >= 2 and answer >= 2
+
+
+def state_scheduler(state, profile):
+    """A FactScheduler for a core.GameState, over the division facts it asks"""
+    return FactScheduler(profile, state.problem_bank, 'division', state.difficulty,
+                         keep=classic_division)
+
+
+def student_name():
+    """NUMCRUNCH_STUDENT, else the logged-in user"""
+    if os.environ.get('NUMCRUNCH_STUDENT'):
+        return os.environ['NUMCRUNCH_STUDENT']
+    try:
+        return getpass.getuser()
+    except (KeyError, OSError):
+        return 'student'
+
+
+def profile_path(student, directory=None):
+    # Keep names readable but safe as file names
+    safe = re.sub(r'[^\w-]', '_', student.strip())[:64] or 'student'
+    return Path(directory or data_dir() / 'students') / f'{safe}.ncm'
+
+
+def load_profile(student=None):
+    """The current student's profile, or None when NUMCRUNCH_MASTERY=0"""
+    if os.environ.get('NUMCRUNCH_MASTERY', '1') == '0':
+        return None
+    student = student or student_name()
+    return MasteryProfile.load(profile_path(student), student)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    student = argv[0] if argv else student_name()
+    profile = MasteryProfile.load(profile_path(student), student)
+    attempts = sum(fields[ATTEMPTS] for fields in profile.stats.values())
+    correct = sum(fields[CORRECT] for fields in profile.stats.values())
+    print(f"{student}: {len(profile.stats)} facts seen over {profile.clock} problems, "
+          f"{correct / max(attempts, 1):.0%} of answers right")
+    for text, fields in profile.weakest():
+        print(f"  {text:>9}  box {fields[BOX]}  {fields[CORRECT]}/{fields[ATTEMPTS]} right"
+              f"  {fields[LATENCY] / 1000:.1f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,82 @@
+"""Idle-aware frame pacing.
+
+While a game is running the loop ticks at a steady 60 FPS. On static
+screens (menu, game over) there is nothing to animate, so instead of
+spinning at 60 FPS the loop blocks in ``pygame.event.wait`` until a key is
+pressed or the idle interval runs out, and wakes early if a scheduled event
+is due. The pacer also measures wall and CPU time per frame so the savings
+can be checked with ``report()``.
+
+Set NUMCRUNCH_PACING=fixed to tick at 60 FPS everywhere, as before, and
+NUMCRUNCH_PACING_REPORT=1 to print the report, with the sound bank's
+counters (game.sound_bank), when the game exits.
+"""
+import os
+import time
+
+import pygame
+
+ACTIVE_FPS = 60
+IDLE_FPS = 5
+
+
+def adaptive_pacing_enabled():
+    return os.environ.get('NUMCRUNCH_PACING', 'adaptive') != 'fixed'
+
+
+def pacing_report_enabled():
+    return os.environ.get('NUMCRUNCH_PACING_REPORT', '0') == '1'
+
+
+class FramePacer:
+    def __init__(self, active_fps=ACTIVE_FPS, idle_fps=IDLE_FPS, adaptive=True):
+        self.active_fps = active_fps
+        self.idle_fps = idle_fps
+        self.adaptive = adaptive
+        self.clock = pygame.time.Clock()
+        self.idle = False
+        # mode -> [frames, wall seconds, cpu seconds]
+        self.stats = {'active': [0, 0.0, 0.0], 'idle': [0, 0.0, 0.0]}
+        self._mark = None
+
+    def events(self, busy=True, next_due=None):
+        """Wait for the next frame and return its events.
+
+        ``busy`` means something is animating, so the frame is paced at
+        ``active_fps``. Otherwise the call blocks until an event arrives,
+        ``next_due`` (a ``pygame.time.get_ticks`` time) is reached, or the
+        idle interval passes.
+        """
+        self._account()
+        self.idle = self.adaptive and not busy
+        if not self.idle:
+            self.clock.tick(self.active_fps)
+            return pygame.event.get()
+
+        timeout = 1000 // self.idle_fps
+        if next_due is not None:
+            timeout = max(0, min(timeout, int(next_due - pygame.time.get_ticks())))
+        first = pygame.event.wait(timeout)
+        # Keep the clock's frame timing continuous for when play resumes
+        self.clock.tick()
+        events = [] if first.type == pygame.NOEVENT else [first]
+        return events + pygame.event.get()
+
+    def _account(self):
+        now = (time.perf_counter(), time.process_time())
+        if self._mark is not None:
+            stats = self.stats['idle' if self.idle else 'active']
+            stats[0] += 1
+            stats[1] += now[0] - self._mark[0]
+            stats[2] += now[1] - self._mark[1]
+        self._mark = now
+
+    def report(self):
+        """One line per mode: frames, frame rate, and CPU time per frame and overall"""
+        lines = []
+        for mode, (frames, wall, cpu) in self.stats.items():
+            if not frames:
+                continue
+            lines.append(f"{mode}: {frames} frames, {frames / wall:.1f} FPS, "
+                         f"{1000 * cpu / frames:.2f} ms CPU/frame, {100 * cpu / wall:.1f}% CPU")
+        return '\n'.join(lines) or "no frames"
@@ -0,0 +1,23 @@
+"""Per-user directories for files the game writes"""
+import os
+from pathlib import Path
+
+
+def cache_dir():
+    """NUMCRUNCH_CACHE_DIR, or numcrunch/ under the user's cache directory"""
+    if os.environ.get('NUMCRUNCH_CACHE_DIR'):
+        return Path(os.environ['NUMCRUNCH_CACHE_DIR'])
+    base = os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache'
+    return Path(base) / 'numcrunch'
+
+
+def data_dir():
+    """NUMCRUNCH_DATA_DIR, or numcrunch/ under the user's data directory.
+
+    Unlike the cache, this holds records (telemetry, scores, ...) that
+    should not be deleted to free space.
+    """
+    if os.environ.get('NUMCRUNCH_DATA_DIR'):
+        return Path(os.environ['NUMCRUNCH_DATA_DIR'])
+    base = os.environ.get('XDG_DATA_HOME') or Path.home() / '.local' / 'share'
+    return Path(base) / 'numcrunch'
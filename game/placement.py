@@ -0,0 +1,101 @@
+"""Where the correct answer goes on the grid.
+
+``ProximityIndex`` precomputes, once per grid size, the cell offsets of
+every Manhattan-distance ring, so finding the cells nearest a position is a
+walk over the first few rings instead of sorting the whole board.
+
+Placement policies are plain functions ``policy(index, rng, player_pos,
+blocked, view_size)`` returning the (row, col) for the correct answer, where
+``blocked`` holds the (x, y) cells of walls and enemies and ``view_size``
+is how many cells across the player sees (None when the whole board shows).
+"""
+from functools import lru_cache
+
+from game.camera import view_origin
+
+
+class ProximityIndex:
+    def __init__(self, grid_size):
+        self.grid_size = grid_size
+        # rings[d] holds the (dx, dy) offsets at distance d, in row then column order
+        self.rings = []
+        for d in range(2 * grid_size - 1):
+            ring = [(dx, dy) for dy in range(-d, d + 1)
+                    for dx in sorted({-(d - abs(dy)), d - abs(dy)})]
+            self.rings.append(ring)
+
+    def nearest(self, pos, k, exclude=(), area=None):
+        """Return up to ``k`` (row, col) cells closest to ``pos``.
+
+        ``area`` (left, top, width) limits the search to a square of the
+        board. Ties are broken by row and then column.
+        """
+        left, top, width = area if area is not None else (0, 0, self.grid_size)
+        x, y = pos
+        found = []
+        # Every cell of the area is within this many rings of pos
+        for ring in self.rings[:2 * width - 1 + abs(x - left) + abs(y - top)]:
+            for dx, dy in ring:
+                col, row = x + dx, y + dy
+                if (left <= col < left + width and top <= row < top + width
+                        and (col, row) not in exclude):
+                    found.append((row, col))
+                    if len(found) == k:
+                        return found
+        return found
+
+    def random_cell(self, rng, exclude=()):
+        """Return a uniformly random (row, col) not in ``exclude`` (x, y) cells"""
+        size = self.grid_size
+        skipped = sorted({y * size + x for x, y in exclude})
+        slot = rng.randrange(size * size - len(skipped))
+        for index in skipped:
+            if slot >= index:
+                slot += 1
+        return divmod(slot, size)
+
+
+@lru_cache(maxsize=8)
+def proximity_index(grid_size):
+    return ProximityIndex(grid_size)
+
+
+def anywhere(index, rng, player_pos, blocked, view_size=None):
+    """Any cell not occupied by the player, an enemy or a wall"""
+    return index.random_cell(rng, set(blocked) | {tuple(player_pos)})
+
+
+def near_player(index, rng, player_pos, blocked, view_size=None, choices=3):
+    """One of the ``choices`` free cells closest to the player"""
+    return rng.choice(index.nearest(player_pos, choices, exclude=blocked))
+
+
+def nearby(index, rng, player_pos, blocked, view_size=None):
+    """One of the 12 free cells closest to the player among those on screen
+    (the ``view_size`` square the camera shows around the player), so the
+    answer stays visible when the board scrolls. That is every free cell
+    within two steps, unless edges or enemies leave fewer than 12 there.
+    """
+    # Never the player's own cell: that answer would be eaten without a move
+    exclude = set(blocked) | {tuple(player_pos)}
+    if view_size is not None:
+        area = (*view_origin(index.grid_size, view_size, player_pos), min(view_size, index.grid_size))
+        cells = index.nearest(player_pos, 12, exclude, area)
+        if cells:
+            return rng.choice(cells)
+    # Nothing free on screen (or no camera): the closest free cells anywhere
+    return rng.choice(index.nearest(player_pos, 12, exclude))
+
+
+PLACEMENT_POLICIES = {
+    'anywhere': anywhere,
+    'near_player': near_player,
+    'nearby': nearby,
+}
+
+
+def place_answer(policy, grid_size, rng, player_pos, blocked=frozenset(), view_size=None):
+    """Pick the (row, col) for the correct answer with a policy name or function"""
+    if isinstance(policy, str):
+        policy = PLACEMENT_POLICIES[policy]
+    return policy(proximity_index(grid_size), rng, player_pos, blocked, view_size)
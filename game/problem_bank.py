@@ -0,0 +1,229 @@
+"""Pre-generated problem bank.
+
+Every valid problem for each operation is enumerated once and written to a
+compact binary file, grouped by operation and difficulty tier. The loader
+memory-maps the file, so drawing a problem is a single random index and
+several processes can share one bank.
+
+The bank lives in the user's cache directory under a name derived from a
+hash of the generators below, so editing OPERATIONS (or a generator)
+builds a fresh bank on the next launch instead of serving a stale one.
+
+Build a bank explicitly with::
+
+    python -m game.problem_bank [path]
+"""
+import bisect
+import hashlib
+import mmap
+import os
+import random
+import struct
+import sys
+from array import array
+from collections import namedtuple
+from pathlib import Path
+
+from game.paths import cache_dir
+
+MAGIC = b'NCPB'
+VERSION = 1                        # file layout; generator changes are caught by bank_path
+HEADER = struct.Struct('<4sHHI')   # magic, version, group count, record count
+GROUP = struct.Struct('<BBII')     # operation code, tier, first record, record count
+RECORD_FIELDS = 3                  # a, b, answer as native-order int16
+TIERS = (0, 1, 2)                  # easy, medium, hard
+
+Operation = namedtuple('Operation', 'code symbol problems')
+
+
+def _tier(largest, easy, medium):
+    if largest <= easy:
+        return 0
+    return 1 if largest <= medium else 2
+
+
+def _addition():
+    for a in range(1, 21):
+        for b in range(1, 21):
+            yield a, b, a + b, _tier(max(a, b), 5, 10)
+
+
+def _subtraction():
+    for a in range(1, 21):
+        for b in range(1, a + 1):
+            yield a, b, a - b, _tier(a, 5, 10)
+
+
+def _multiplication():
+    for a in range(1, 13):
+        for b in range(1, 13):
+            yield a, b, a * b, _tier(max(a, b), 5, 9)
+
+
+def _division():
+    for b in range(1, 13):
+        for answer in range(1, 13):
+            yield b * answer, b, answer, _tier(max(b, answer), 5, 9)
+
+
+# New operations only need a code, a symbol and a generator of
+# (a, b, answer, tier) tuples; rebuild the bank after adding one.
+OPERATIONS = {
+    'addition': Operation(0, '+', _addition),
+    'subtraction': Operation(1, '-', _subtraction),
+    'multiplication': Operation(2, '×', _multiplication),
+    'division': Operation(3, '÷', _division),
+}
+
+
+def definitions_hash(operations=OPERATIONS):
+    """Hash of the file layout and every generator's code and constants"""
+    digest = hashlib.sha1(f'{VERSION} {HEADER.format} {GROUP.format} {RECORD_FIELDS}'.encode())
+    functions = [('_tier', None, None, _tier)] + [
+        (name, op.code, op.symbol, op.problems) for name, op in sorted(operations.items())]
+    for name, code, symbol, function in functions:
+        body = function.__code__
+        digest.update(repr((name, code, symbol, body.co_consts, body.co_names)).encode())
+        digest.update(body.co_code)
+    return digest.hexdigest()[:16]
+
+
+def bank_path(operations=OPERATIONS):
+    """Where the bank for ``operations`` is cached"""
+    return cache_dir() / f'problems-{definitions_hash(operations)}.bin'
+
+
+def format_problem(operation, a, b):
+    return f"{a} {OPERATIONS[operation].symbol} {b}"
+
+
+def encode_bank(operations=OPERATIONS):
+    """Enumerate every problem and return the bank file contents"""
+    groups = []
+    records = array('h')
+    for name, op in sorted(operations.items(), key=lambda item: item[1].code):
+        by_tier = {}
+        for a, b, answer, tier in op.problems():
+            by_tier.setdefault(tier, []).append((a, b, answer))
+        for tier in sorted(by_tier):
+            groups.append((op.code, tier, len(records) // RECORD_FIELDS, len(by_tier[tier])))
+            for problem in by_tier[tier]:
+                records.extend(problem)
+
+    header = HEADER.pack(MAGIC, VERSION, len(groups), len(records) // RECORD_FIELDS)
+    return header + b''.join(GROUP.pack(*group) for group in groups) + records.tobytes()
+
+
+def build_bank(path=None, operations=OPERATIONS):
+    """Write the bank file atomically and return its path"""
+    path = Path(path) if path is not None else bank_path(operations)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix('.tmp')
+    tmp_path.write_bytes(encode_bank(operations))
+    os.replace(tmp_path, path)
+    return path
+
+
+class ProblemBank:
+    """Read-only view over a bank file or buffer"""
+
+    def __init__(self, buffer, operations=OPERATIONS):
+        self._buffer = buffer
+        magic, version, group_count, record_count = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("not a NumCrunch problem bank (or built by another version)")
+
+        names = {op.code: name for name, op in operations.items()}
+        self._groups = {}
+        self._spans = {}
+        offset = HEADER.size
+        for _ in range(group_count):
+            code, tier, start, count = GROUP.unpack_from(buffer, offset)
+            offset += GROUP.size
+            name = names[code]
+            self._groups[name, tier] = (start, count)
+            first, total = self._spans.get(name, (start, 0))
+            self._spans[name] = (first, total + count)
+        self.operations = sorted(self._spans, key=lambda name: operations[name].code)
+        self._starts = sorted((start, name) for name, (start, _) in self._spans.items())
+        self._records = memoryview(buffer)[offset:offset + record_count * RECORD_FIELDS * 2].cast('h')
+
+    @classmethod
+    def open(cls, path=None):
+        """Map the bank file at ``path`` (the cached bank by default)"""
+        with open(path if path is not None else bank_path(), 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(mapped)
+
+    def count(self, operation, tier=None):
+        span = self._spans.get(operation) if tier is None else self._groups.get((operation, tier))
+        return span[1] if span else 0
+
+    def facts(self, operation=None, tier=None):
+        """Record indices matching the filter, as a list of ranges"""
+        names = self.operations if operation is None else [operation]
+        spans = [self._spans.get(name) if tier is None else self._groups.get((name, tier))
+                 for name in names]
+        return [range(start, start + count) for start, count in filter(None, spans)]
+
+    def fact(self, index):
+        """(operation, a, b, answer) of the record at ``index``"""
+        operation = self._starts[bisect.bisect_right(self._starts, (index, '\uffff')) - 1][1]
+        i = index * RECORD_FIELDS
+        a, b, answer = self._records[i:i + RECORD_FIELDS]
+        return operation, a, b, answer
+
+    def draw_raw(self, rng=random, operation=None, tier=None):
+        """Return (operation, a, b, answer) drawn uniformly from the filter"""
+        if operation is None:
+            operation = rng.choice(self.operations)
+        span = self._spans[operation] if tier is None else self._groups.get((operation, tier))
+        if not span:
+            raise KeyError(f"no {operation} problems in tier {tier}")
+        start, count = span
+        i = (start + rng.randrange(count)) * RECORD_FIELDS
+        a, b, answer = self._records[i:i + RECORD_FIELDS]
+        return operation, a, b, answer
+
+    def draw(self, rng=random, operation=None, tier=None):
+        """Return (problem text, answer)"""
+        operation, a, b, answer = self.draw_raw(rng, operation, tier)
+        return format_problem(operation, a, b), answer
+
+
+_default_bank = None
+
+
+def load_bank(path=None):
+    """Open the bank at ``path`` (the cached bank by default), building it
+    first if it is missing or unreadable"""
+    global _default_bank
+    if path is None and _default_bank is not None:
+        return _default_bank
+    target = Path(path) if path is not None else bank_path()
+    try:
+        bank = ProblemBank.open(target)
+    except (OSError, ValueError, struct.error):
+        try:
+            bank = ProblemBank.open(build_bank(target))
+        except OSError:
+            # Cache not writable: keep the bank in memory instead
+            bank = ProblemBank(encode_bank())
+        else:
+            if path is None:
+                # Banks built from older generators are never read again
+                for old in target.parent.glob('problems-*.bin'):
+                    if old != target:
+                        old.unlink(missing_ok=True)
+    if path is None:
+        _default_bank = bank
+    return bank
+
+
+if __name__ == '__main__':
+    out = build_bank(sys.argv[1] if len(sys.argv) > 1 else None)
+    bank = ProblemBank.open(out)
+    for name in bank.operations:
+        tiers = ', '.join(f"tier {t}: {bank.count(name, t)}" for t in TIERS)
+        print(f"{name}: {bank.count(name)} problems ({tiers})")
+    print(f"Wrote {out}")
@@ -0,0 +1,181 @@
+"""Frame profiler and debug overlay.
+
+The loop brackets each frame with ``begin_frame``/``end_frame`` and calls
+``mark(name)`` after each piece of work (event handling, logic, each draw
+function); a mark records the time since the previous one. Counters
+registered with ``watch`` (e.g. surfaces created) are sampled once per
+frame. While the profiler is disabled every call returns after a single
+attribute check.
+
+F3 toggles the overlay (frame-time graph, FPS, time per mark, counters
+per frame, cache hit rates) and F4 writes the recorded frames as a Chrome
+trace (open in chrome://tracing or ui.perfetto.dev). NUMCRUNCH_PROFILE=1
+shows the overlay from startup.
+"""
+import json
+import os
+import time
+from collections import deque
+
+import pygame
+
+from game.layers import solid_overlay
+from game.text_cache import TextCache
+
+HISTORY = 600  # frames kept for the overlay and trace dumps
+GRAPH_FRAMES = 120
+OVERLAY_SIZE = (280, 210)
+GRAPH_HEIGHT = 50
+GRAPH_MAX_MS = 50
+TARGET_MS = 1000 / 60
+
+# The overlay's numbers change every frame; keep them out of the game's text cache
+_overlay_text = TextCache(max_size=64)
+
+
+def profiling_enabled():
+    return os.environ.get('NUMCRUNCH_PROFILE', '0') == '1'
+
+
+class Profiler:
+    def __init__(self, history=HISTORY):
+        self.enabled = False
+        # (start, end, ((name, start, end), ...), {counter: delta}) per frame
+        self.frames = deque(maxlen=history)
+        self._watches = {}
+        self._hit_rates = {}
+        self._start = self._last = None
+        self._marks = []
+        self._counts = {}
+
+    def watch(self, name, read):
+        """Sample the counter ``read()`` every frame and record its increase"""
+        self._watches[name] = read
+
+    def hit_rate(self, name, read_hits, read_misses):
+        """Show ``name`` as a hit rate computed from two counters"""
+        self._hit_rates[name] = (read_hits, read_misses)
+        self.watch(f'{name} hits', read_hits)
+        self.watch(f'{name} misses', read_misses)
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        self._start = None
+        self._counts = {}
+        return self.enabled
+
+    def begin_frame(self):
+        if not self.enabled:
+            return
+        self._start = self._last = time.perf_counter()
+        self._marks = []
+        if not self._counts:
+            self._counts = {name: read() for name, read in self._watches.items()}
+
+    def mark(self, name):
+        """Attribute the time since the previous mark to ``name``"""
+        if not self.enabled or self._start is None:
+            return
+        now = time.perf_counter()
+        self._marks.append((name, self._last, now))
+        self._last = now
+
+    def end_frame(self):
+        if not self.enabled or self._start is None:
+            return
+        deltas = {}
+        for name, read in self._watches.items():
+            value = read()
+            deltas[name] = value - self._counts.get(name, value)
+            self._counts[name] = value
+        self.frames.append((self._start, time.perf_counter(), tuple(self._marks), deltas))
+
+    def summary(self, frames=60):
+        """Averages over the last ``frames`` frames (times in ms)"""
+        recent = list(self.frames)[-frames:]
+        if not recent:
+            return None
+        frame_ms = sorted(1000 * (end - start) for start, end, _, _ in recent)
+        marks = {}
+        counters = {}
+        for _, _, frame_marks, deltas in recent:
+            for name, start, end in frame_marks:
+                marks[name] = marks.get(name, 0) + 1000 * (end - start)
+            for name, delta in deltas.items():
+                counters[name] = counters.get(name, 0) + delta
+        wall = recent[-1][1] - recent[0][0]
+        return {
+            'fps': len(recent) / wall if wall > 0 else 0.0,
+            'frame_ms': sum(frame_ms) / len(recent),
+            'p95_ms': frame_ms[int(0.95 * (len(frame_ms) - 1))],
+            'marks': {name: total / len(recent) for name, total in marks.items()},
+            'counters': {name: total / len(recent) for name, total in counters.items()},
+            'hit_rates': {name: self._rate(counters, name) for name in self._hit_rates},
+        }
+
+    @staticmethod
+    def _rate(counters, name):
+        hits, misses = counters.get(f'{name} hits', 0), counters.get(f'{name} misses', 0)
+        return hits / (hits + misses) if hits + misses else None
+
+    def dump(self, path=None):
+        """Write the recorded frames as a Chrome trace; returns the path"""
+        path = path or time.strftime('numcrunch-profile-%Y%m%d-%H%M%S.json')
+        events = []
+        for start, end, marks, deltas in self.frames:
+            events.append({'name': 'frame', 'ph': 'X', 'pid': 0, 'tid': 0,
+                           'ts': start * 1e6, 'dur': (end - start) * 1e6})
+            for name, mark_start, mark_end in marks:
+                events.append({'name': name, 'ph': 'X', 'pid': 0, 'tid': 1,
+                               'ts': mark_start * 1e6, 'dur': (mark_end - mark_start) * 1e6})
+            if deltas:
+                events.append({'name': 'counters', 'ph': 'C', 'pid': 0, 'ts': end * 1e6,
+                               'args': deltas})
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+        return path
+
+    def draw(self, surface, font, topleft):
+        """Draw the overlay at ``topleft``; returns the rect it covers"""
+        rect = pygame.Rect(topleft, OVERLAY_SIZE)
+        surface.blit(solid_overlay(OVERLAY_SIZE, (0, 0, 0, 190)), rect)
+        summary = self.summary()
+        if summary is None:
+            return rect
+
+        # Frame-time graph: bar height is frame time, the brighter part is work
+        # (everything but waiting for the next frame)
+        graph_bottom = rect.top + 8 + GRAPH_HEIGHT
+        x = rect.right - 8 - GRAPH_FRAMES * 2
+        for start, end, marks, _ in list(self.frames)[-GRAPH_FRAMES:]:
+            total = 1000 * (end - start)
+            work = total - sum(1000 * (e - s) for name, s, e in marks if name == 'wait')
+            for ms, color in ((total, (90, 90, 90)), (work, (80, 220, 80) if total < 2 * TARGET_MS
+                                                          else (240, 80, 60))):
+                height = min(GRAPH_HEIGHT, int(GRAPH_HEIGHT * ms / GRAPH_MAX_MS))
+                pygame.draw.line(surface, color, (x, graph_bottom), (x, graph_bottom - height))
+            x += 2
+        target_y = graph_bottom - int(GRAPH_HEIGHT * TARGET_MS / GRAPH_MAX_MS)
+        pygame.draw.line(surface, (255, 255, 0), (rect.right - 8 - GRAPH_FRAMES * 2, target_y),
+                         (rect.right - 8, target_y))
+
+        lines = [f"{summary['fps']:.0f} FPS  frame {summary['frame_ms']:.1f} ms"
+                 f"  p95 {summary['p95_ms']:.1f}"]
+        marks = [f"{name} {ms:.2f}" for name, ms in summary['marks'].items() if name != 'wait']
+        lines += [', '.join(marks[i:i + 3]) for i in range(0, len(marks), 3)]
+        counters = [f"{name} {per_frame:.1f}/f" for name, per_frame in summary['counters'].items()
+                    if not name.endswith((' hits', ' misses'))]
+        rates = [f"{name} {rate:.0%}" for name, rate in summary['hit_rates'].items()
+                 if rate is not None]
+        lines += [', '.join(counters[i:i + 2]) for i in range(0, len(counters), 2)]
+        lines.append(', '.join(rates))
+
+        y = graph_bottom + 6
+        for line in lines:
+            text = _overlay_text.render(font, line, (255, 255, 255))
+            surface.blit(text, (rect.left + 8, y))
+            y += text.get_height()
+        return rect
+
+
+profiler = Profiler()
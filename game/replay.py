@@ -0,0 +1,212 @@
+"""Session recording and deterministic replay.
+
+A game is fully determined by its RNG seed, its GameState options and the
+times at which actions happened (see ``core.step``). A replay file stores
+exactly that, plus the mastery profile problems were picked from (see
+game.mastery):
+
+    b'NCRP', version (u8), seed (u64), options length (u16), options (JSON)
+    profile length (u32), the student's mastery profile at the start (or empty)
+    one varint per action: (ms since the previous action << 3) | action code
+    a final varint with the END code and the session's last timestamp
+
+so a minute of play is typically a couple of hundred bytes. Sessions are
+recorded to <cache dir>/replays/ (the newest MAX_REPLAYS are kept);
+NUMCRUNCH_RECORD=0 turns recording off and NUMCRUNCH_RECORD=<file> writes
+to a specific file.
+
+    python -m game.replay session.ncr [more.ncr ...]   # headless, max speed
+    python -m game.replay session.ncr --render [--speed 2]
+"""
+import argparse
+import json
+import os
+import random
+import struct
+import sys
+import time
+from pathlib import Path
+
+from game import core
+from game.mastery import MasteryProfile, state_scheduler
+from game.paths import cache_dir
+
+MAGIC = b'NCRP'
+VERSION = 2
+HEADER = struct.Struct('<BQH')
+PROFILE_LENGTH = struct.Struct('<I')
+ACTION_CODES = {core.START: 0, core.LEFT: 1, core.RIGHT: 2, core.UP: 3, core.DOWN: 4}
+ACTIONS = {code: action for action, code in ACTION_CODES.items()}
+END = 7
+MAX_REPLAYS = 50
+
+
+def new_seed():
+    """NUMCRUNCH_SEED if set, else a fresh random seed"""
+    if os.environ.get('NUMCRUNCH_SEED'):
+        return int(os.environ['NUMCRUNCH_SEED'])
+    return random.SystemRandom().getrandbits(63)
+
+
+def _varint(value):
+    out = bytearray()
+    while value >= 0x80:
+        out.append(value & 0x7f | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def _read_varints(data, offset):
+    value = shift = 0
+    for byte in data[offset:]:
+        value |= (byte & 0x7f) << shift
+        shift += 7
+        if not byte & 0x80:
+            yield value
+            value = shift = 0
+
+
+class Recorder:
+    def __init__(self, path, seed, options, start=0, profile=None):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, 'wb')
+        encoded = json.dumps(options, sort_keys=True).encode()
+        snapshot = profile.to_bytes() if profile is not None else b''
+        self._file.write(MAGIC + HEADER.pack(VERSION, seed, len(encoded)) + encoded
+                         + PROFILE_LENGTH.pack(len(snapshot)) + snapshot)
+        self._start = self._last = start
+
+    def record(self, now, action):
+        """Append ``action`` (a core action) taken at ``now``"""
+        self._file.write(_varint((now - self._last) << 3 | ACTION_CODES[action]))
+        self._last = now
+
+    def close(self, now):
+        if self._file.closed:
+            return
+        self._file.write(_varint((max(now, self._last) - self._last) << 3 | END))
+        self._file.close()
+
+
+def start_recording(seed, options, start=0, profile=None):
+    """A Recorder for a new session, or None when NUMCRUNCH_RECORD=0.
+
+    Pass the mastery ``profile`` before the session changes it.
+    """
+    target = os.environ.get('NUMCRUNCH_RECORD', '1')
+    if target == '0':
+        return None
+    if target != '1':
+        return Recorder(target, seed, options, start, profile)
+
+    directory = cache_dir() / 'replays'
+    try:
+        # The pid keeps two windows started in the same second apart
+        name = time.strftime('session-%Y%m%d-%H%M%S') + f'-{os.getpid()}.ncr'
+        recorder = Recorder(directory / name, seed, options, start, profile)
+    except OSError:
+        return None
+    for old in sorted(directory.glob('session-*.ncr'))[:-MAX_REPLAYS]:
+        old.unlink(missing_ok=True)
+    return recorder
+
+
+class Replay:
+    def __init__(self, seed, options, actions, end, profile=None):
+        self.seed = seed
+        self.options = options
+        self.profile = profile  # MasteryProfile snapshot, or None
+        self.actions = actions  # [(ms since the session started, action)]
+        self.end = end
+        self._next = 0
+
+    @classmethod
+    def load(cls, path):
+        data = Path(path).read_bytes()
+        if data[:4] != MAGIC:
+            raise ValueError(f"{path} is not a replay")
+        version, seed, length = HEADER.unpack_from(data, 4)
+        if version not in (1, VERSION):
+            raise ValueError(f"{path} has unsupported replay version {version}")
+        offset = 4 + HEADER.size
+        options = json.loads(data[offset:offset + length])
+        offset += length
+        profile = None
+        if version >= 2:
+            (snapshot_length,) = PROFILE_LENGTH.unpack_from(data, offset)
+            offset += PROFILE_LENGTH.size
+            if snapshot_length:
+                profile = MasteryProfile.from_bytes(data[offset:offset + snapshot_length])
+            offset += snapshot_length
+
+        actions = []
+        now = 0
+        end = None
+        for value in _read_varints(data, offset):
+            now += value >> 3
+            if value & 7 == END:
+                end = now
+                break
+            actions.append((now, ACTIONS[value & 7]))
+        # A session that crashed has no END record; stop at its last action
+        return cls(seed, options, actions, now if end is None else end, profile)
+
+    def new_state(self):
+        state = core.GameState(seed=self.seed, **self.options)
+        if self.profile is not None:
+            # A copy, so playing back never changes the recorded snapshot
+            profile = MasteryProfile.from_bytes(self.profile.to_bytes())
+            state.facts = state_scheduler(state, profile)
+        return state
+
+    def due(self, now):
+        """Pop the (time, action) pairs recorded up to ``now``"""
+        start = self._next
+        while self._next < len(self.actions) and self.actions[self._next][0] <= now:
+            self._next += 1
+        return self.actions[start:self._next]
+
+    @property
+    def finished(self):
+        return self._next >= len(self.actions)
+
+
+def replay_headless(replay):
+    """Run a whole replay through the game rules; returns the final state"""
+    state = replay.new_state()
+    for at, action in replay.actions:
+        core.step(state, action, at)
+    core.step(state, None, replay.end)
+    return state
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play back recorded sessions")
+    parser.add_argument('replays', nargs='+')
+    parser.add_argument('--render', action='store_true', help="show the first replay in a window")
+    parser.add_argument('--speed', type=float, default=1.0, help="playback speed with --render")
+    args = parser.parse_args(argv)
+
+    if args.render:
+        from game import NumCrunch_Academy as app
+        app.main(Replay.load(args.replays[0]), args.speed)
+        return 0
+
+    started = time.perf_counter()
+    played_ms = 0
+    for path in args.replays:
+        replay = Replay.load(path)
+        state = replay_headless(replay)
+        played_ms += replay.end
+        print(f"{path}: score {state.score}, lives {state.lives}, "
+              f"{len(replay.actions)} actions over {replay.end / 1000:.1f}s")
+    elapsed = time.perf_counter() - started
+    print(f"Replayed {len(args.replays)} sessions ({played_ms / 60000:.1f} min of play) "
+          f"in {elapsed:.2f}s, {played_ms / 1000 / max(elapsed, 1e-9):.0f}x real time")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,61 @@
+"""Timed game events.
+
+Events (enemy moves, feedback expiry, difficulty ramps, ...) are kept in a
+heap ordered by due time. The loop drains whatever is due each tick, so
+game speed depends on the clock rather than the frame rate, and
+``next_due`` tells the loop how long it may sleep.
+"""
+import heapq
+import itertools
+
+# Heap entry fields
+_WHEN, _SEQ, _CALLBACK, _ARGS, _CANCELLED = range(5)
+
+
+class Scheduler:
+    def __init__(self):
+        self._heap = []
+        self._seq = itertools.count()
+
+    def schedule(self, when, callback, *args):
+        """Call ``callback(*args, when)`` once the clock reaches ``when``.
+
+        Returns a handle for ``cancel``.
+        """
+        entry = [when, next(self._seq), callback, args, False]
+        heapq.heappush(self._heap, entry)
+        return entry
+
+    def cancel(self, handle):
+        if handle is not None:
+            handle[_CANCELLED] = True
+
+    def clear(self):
+        self._heap.clear()
+
+    def next_due(self):
+        """Time of the earliest pending event, or None"""
+        heap = self._heap
+        while heap and heap[0][_CANCELLED]:
+            heapq.heappop(heap)
+        return heap[0][_WHEN] if heap else None
+
+    def run_due(self, now):
+        """Run every event due by ``now`` in time order.
+
+        Callbacks receive their scheduled time, so a late tick catches up
+        exactly. Lists returned by callbacks are concatenated and returned.
+        """
+        results = []
+        heap = self._heap
+        while heap and heap[0][_WHEN] <= now:
+            entry = heapq.heappop(heap)
+            if entry[_CANCELLED]:
+                continue
+            result = entry[_CALLBACK](*entry[_ARGS], entry[_WHEN])
+            if result:
+                results += result
+        return results
+
+    def __len__(self):
+        return sum(1 for entry in self._heap if not entry[_CANCELLED])
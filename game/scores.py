@@ -0,0 +1,185 @@
+"""Local score history and leaderboards.
+
+Every finished game is kept in SQLite at <data dir>/scores.sqlite3
+(NUMCRUNCH_SCORES=0 turns this off, NUMCRUNCH_SCORES=<file> uses another
+database). Indexes cover the two ways scores are read, so both stay a few
+index lookups however many years of games pile up:
+
+* per-student history: (student, played_at)
+* leaderboards: (mode, difficulty, score) for top-k over long ranges and
+  (mode, difficulty, played_at) for short ones like "today"
+
+All database work happens on one background thread. ``add`` only buffers a
+row and ``flush`` writes the buffer in one transaction, so many games ending
+together (a classroom) cost one commit. Queries return futures; the game
+loop checks ``done()`` each frame instead of waiting.
+
+    python -m game.scores [--mode M] [--difficulty N] [--days N] [--student S]
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from game.paths import data_dir
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scores (
+    id INTEGER PRIMARY KEY,
+    student TEXT NOT NULL,
+    mode TEXT NOT NULL,            -- e.g. 'division 5x5'
+    difficulty INTEGER NOT NULL,   -- problem tier, -1 for every tier
+    score INTEGER NOT NULL,
+    duration_ms INTEGER NOT NULL,
+    played_at REAL NOT NULL        -- wall clock, seconds since the epoch
+);
+CREATE INDEX IF NOT EXISTS scores_by_student ON scores (student, played_at);
+CREATE INDEX IF NOT EXISTS scores_by_score ON scores (mode, difficulty, score DESC, played_at);
+CREATE INDEX IF NOT EXISTS scores_by_date ON scores (mode, difficulty, played_at);
+"""
+
+# Past this span, walking the score index and skipping games outside the
+# range finds the top k sooner than sorting every game in the range
+LONG_RANGE = 31 * 86400
+
+FIELDS = ('student', 'mode', 'difficulty', 'score', 'duration_ms', 'played_at')
+ALL_TIERS = -1
+
+# Leaderboard date ranges: (label, days back from today's midnight, None for all time)
+RANGES = (('Today', 0), ('This Week', 6), ('All Time', None))
+
+
+def range_start(days):
+    """Epoch seconds of local midnight ``days`` days ago (0 for all time)"""
+    if days is None:
+        return 0.0
+    today = time.localtime()
+    return time.mktime((today.tm_year, today.tm_mon, today.tm_mday - days, 0, 0, 0, 0, 0, -1))
+
+
+def mode_name(operation, grid_size):
+    return f"{operation} {grid_size}x{grid_size}"
+
+
+class ScoreStore:
+    def __init__(self, path):
+        self.path = path
+        self.written = 0
+        self.dropped = 0
+        self._pending = []
+        self._db = None
+        # One worker owns the connection, so reads and writes never interleave
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='scores')
+
+    def add(self, student, mode, difficulty, score, duration_ms, played_at=None):
+        """Buffer one finished game; ``flush`` writes the buffer"""
+        self._pending.append((student, mode, ALL_TIERS if difficulty is None else difficulty,
+                              score, duration_ms, time.time() if played_at is None else played_at))
+
+    def flush(self):
+        """Insert every buffered game in one transaction, off the calling thread"""
+        if self._pending:
+            batch, self._pending = self._pending, []
+            self._pool.submit(self._insert, batch)
+
+    def top(self, mode, difficulty=None, since=0.0, until=None, limit=10):
+        """Future of the best ``limit`` games as [(student, score, played_at)]"""
+        tier = ALL_TIERS if difficulty is None else difficulty
+        until = float('inf') if until is None else until
+        index = 'scores_by_score' if min(until, time.time()) - since > LONG_RANGE else 'scores_by_date'
+        return self._pool.submit(self._query, f"""
+            SELECT student, score, played_at FROM scores INDEXED BY {index}
+            WHERE mode = ? AND difficulty = ? AND played_at >= ? AND played_at < ?
+            ORDER BY score DESC, played_at LIMIT ?""", (mode, tier, since, until, limit))
+
+    def history(self, student, limit=20):
+        """Future of ``student``'s latest games as [(mode, difficulty, score, duration_ms, played_at)]"""
+        return self._pool.submit(self._query, """
+            SELECT mode, difficulty, score, duration_ms, played_at FROM scores
+            WHERE student = ? ORDER BY played_at DESC LIMIT ?""", (student, limit))
+
+    def close(self):
+        """Write what is buffered and stop the worker"""
+        self.flush()
+        self._pool.submit(self._close)
+        self._pool.shutdown(wait=True)
+
+    def _connect(self):
+        if self._db is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._db = sqlite3.connect(self.path)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('PRAGMA synchronous=NORMAL')
+            self._db.executescript(SCHEMA)
+        return self._db
+
+    def _insert(self, batch):
+        try:
+            db = self._connect()
+            with db:
+                db.executemany(f"INSERT INTO scores ({', '.join(FIELDS)}) "
+                               f"VALUES ({', '.join('?' * len(FIELDS))})", batch)
+            self.written += len(batch)
+        except (OSError, sqlite3.Error):
+            # A full disk or locked database must not end the game
+            self.dropped += len(batch)
+
+    def _query(self, sql, params):
+        return self._connect().execute(sql, params).fetchall()
+
+    def _close(self):
+        if self._db is not None:
+            # Keeps the planner's statistics current for choosing between indexes
+            self._db.execute('PRAGMA optimize')
+            self._db.close()
+            self._db = None
+
+
+def scores_path():
+    """Where scores are kept, or None when NUMCRUNCH_SCORES=0"""
+    target = os.environ.get('NUMCRUNCH_SCORES', '1')
+    if target == '0':
+        return None
+    return data_dir() / 'scores.sqlite3' if target == '1' else target
+
+
+def open_scores():
+    """A ScoreStore for this session, or None when NUMCRUNCH_SCORES=0"""
+    path = scores_path()
+    return ScoreStore(path) if path is not None else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Show leaderboards and score history")
+    parser.add_argument('--mode', default=mode_name('division', 5))
+    parser.add_argument('--difficulty', type=int, default=None, help="problem tier (default: all)")
+    parser.add_argument('--days', type=int, default=None, help="only games since midnight N days ago")
+    parser.add_argument('--student', help="show this student's history instead")
+    parser.add_argument('--limit', type=int, default=10)
+    args = parser.parse_args(argv)
+
+    path = scores_path()
+    if path is None or not os.path.exists(path):
+        print("No scores recorded yet")
+        return 0
+    store = ScoreStore(path)
+    started = time.perf_counter()
+    if args.student:
+        rows = store.history(args.student, args.limit).result()
+        for mode, difficulty, score, duration_ms, played_at in rows:
+            print(f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(played_at))}  {mode:<16}"
+                  f" tier {'all' if difficulty == ALL_TIERS else difficulty}  {score:>5}"
+                  f"  {duration_ms / 1000:.0f}s")
+    else:
+        rows = store.top(args.mode, args.difficulty, range_start(args.days), limit=args.limit).result()
+        for rank, (student, score, played_at) in enumerate(rows, 1):
+            print(f"{rank:>3}. {student:<20} {score:>5}  {time.strftime('%Y-%m-%d', time.localtime(played_at))}")
+    print(f"{len(rows)} rows in {1000 * (time.perf_counter() - started):.1f} ms")
+    store.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
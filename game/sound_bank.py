@@ -0,0 +1,127 @@
+"""Sound effects with reserved channels, voice limits and cooldowns.
+
+Effects are decoded once, when they are loaded, into the format the mixer
+was opened with (see MIXER_SETTINGS), so playing one never converts audio.
+Each category of sound gets its own reserved channels, so a burst of
+clicks can't cut off the hurt sound. Each sound has a cap on overlapping
+voices and a minimum gap between plays, so mashing keys doesn't stack
+copies of the same effect.
+"""
+import pygame
+
+MIXER_SETTINGS = dict(frequency=22050, size=-16, channels=2, buffer=512)
+
+# Category -> number of reserved channels
+DEFAULT_CATEGORIES = {
+    'ui': 2,
+    'feedback': 3,
+    'alert': 1,
+    'jingle': 1,
+}
+
+# Asset name -> (category, max voices, cooldown ms)
+SOUND_SETTINGS = {
+    'click': ('ui', 2, 40),
+    'correct': ('feedback', 1, 0),
+    'crunch': ('feedback', 2, 60),
+    'hurt': ('alert', 1, 300),
+    'victory': ('jingle', 1, 0),
+}
+
+
+def init_mixer():
+    """Open the mixer with the game's settings; returns False if there is no audio"""
+    pygame.mixer.pre_init(**MIXER_SETTINGS)
+    try:
+        pygame.mixer.init()
+    except pygame.error:
+        return False
+    return True
+
+
+class SoundBank:
+    def __init__(self, categories=DEFAULT_CATEGORIES):
+        self.categories = dict(categories)
+        self.sounds = {}
+        self.channels = {}
+        self.stats = {'played': 0, 'cooldown': 0, 'voice_limit': 0, 'stolen': 0,
+                      'stalls': 0}
+        self._last_played = {}
+        self._channel_started = {}
+        self._last_tick = None
+        self.enabled = pygame.mixer.get_init() is not None
+        if not self.enabled:
+            return
+
+        reserved = sum(self.categories.values())
+        pygame.mixer.set_num_channels(max(pygame.mixer.get_num_channels(), reserved + 2))
+        pygame.mixer.set_reserved(reserved)
+        first = 0
+        for category, count in self.categories.items():
+            self.channels[category] = [pygame.mixer.Channel(i) for i in range(first, first + count)]
+            first += count
+
+        # One mixer buffer worth of time; a loop stall longer than a few of
+        # these risks an audible gap
+        frequency, _, _ = pygame.mixer.get_init()
+        self.buffer_ms = 1000 * MIXER_SETTINGS['buffer'] / frequency
+
+    def add(self, name, sound, category=None, max_voices=None, cooldown_ms=None):
+        """Register a loaded sound; unset limits come from SOUND_SETTINGS"""
+        default = SOUND_SETTINGS.get(name, ('feedback', 1, 0))
+        self.sounds[name] = (sound,
+                             default[0] if category is None else category,
+                             default[1] if max_voices is None else max_voices,
+                             default[2] if cooldown_ms is None else cooldown_ms)
+
+    def play(self, name, now=None):
+        """Play ``name`` if its cooldown and voice limit allow; returns True if played"""
+        if not self.enabled or name not in self.sounds:
+            return False
+        sound, category, max_voices, cooldown_ms = self.sounds[name]
+        now = pygame.time.get_ticks() if now is None else now
+
+        last = self._last_played.get(name)
+        if last is not None and now - last < cooldown_ms:
+            self.stats['cooldown'] += 1
+            return False
+
+        channels = self.channels[category]
+        voices = [c for c in channels if c.get_busy() and c.get_sound() is sound]
+        if len(voices) >= max_voices:
+            self.stats['voice_limit'] += 1
+            return False
+
+        channel = next((c for c in channels if not c.get_busy()), None)
+        if channel is None:
+            # Category is full: cut the oldest voice of this category
+            channel = min(channels, key=lambda c: self._channel_started.get(c, 0))
+            self.stats['stolen'] += 1
+        channel.play(sound)
+        self._last_played[name] = now
+        self._channel_started[channel] = now
+        self.stats['played'] += 1
+        return True
+
+    def tick(self, now):
+        """Call once per frame to count loop stalls long enough to starve the mixer.
+
+        pygame has no underrun counter, so a frame that took longer than
+        four mixer buffers is reported as a likely underrun. Pass None for
+        frames where the loop is deliberately idle.
+        """
+        if now is None:
+            self._last_tick = None
+            return
+        if self.enabled and self._last_tick is not None and now - self._last_tick > 4 * self.buffer_ms:
+            self.stats['stalls'] += 1
+        self._last_tick = now
+
+    def report(self):
+        """One line: sounds played, plays skipped or cut by each limit, and likely underruns"""
+        if not self.enabled:
+            return "sound: no audio device"
+        stats = self.stats
+        return (f"sound: {stats['played']} played, {stats['cooldown']} skipped by cooldown, "
+                f"{stats['voice_limit']} by voice limit, {stats['stolen']} voices cut, "
+                f"{stats['stalls']} likely underruns")
@@ -0,0 +1,112 @@
+"""Per-answer telemetry for learning analytics.
+
+``log`` only puts the record on a queue, so the game loop never waits for
+the disk. A background thread collects records and writes them to SQLite
+in batches (one transaction per BATCH_SIZE records or FLUSH_INTERVAL
+seconds, whichever comes first). Records go to <data dir>/telemetry.sqlite3;
+NUMCRUNCH_TELEMETRY=0 turns telemetry off and NUMCRUNCH_TELEMETRY=<file>
+writes to a specific database.
+"""
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+
+from game.paths import data_dir
+
+BATCH_SIZE = 64
+FLUSH_INTERVAL = 2.0  # seconds
+
+FIELDS = ('session', 'logged_at', 'at', 'problem', 'answer', 'chosen', 'correct',
+          'latency_ms', 'lives', 'score', 'enemy_distance')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS answers (
+    session TEXT NOT NULL,
+    logged_at REAL NOT NULL,     -- wall clock, seconds since the epoch
+    at INTEGER NOT NULL,         -- game time in ms
+    problem TEXT NOT NULL,
+    answer INTEGER NOT NULL,
+    chosen INTEGER NOT NULL,
+    correct INTEGER NOT NULL,
+    latency_ms INTEGER NOT NULL,
+    lives INTEGER NOT NULL,
+    score INTEGER NOT NULL,
+    enemy_distance INTEGER
+)
+"""
+
+_STOP = object()
+
+
+class TelemetryWriter:
+    def __init__(self, path, session=None, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL):
+        self.path = path
+        self.session = session or uuid.uuid4().hex[:12]
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.dropped = 0
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name='telemetry', daemon=True)
+        self._thread.start()
+
+    def log(self, record):
+        """Queue one answer_record() (a dict); never blocks"""
+        self._queue.put((self.session, time.time()) + tuple(record[field] for field in FIELDS[2:]))
+
+    def close(self, timeout=5.0):
+        """Write everything still queued and stop the thread"""
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def _run(self):
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            db = sqlite3.connect(self.path)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            db.execute(SCHEMA)
+        except (OSError, sqlite3.Error):
+            db = None
+
+        stopping = False
+        while not stopping:
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            if batch:
+                self._write(db, batch)
+        if db is not None:
+            db.close()
+
+    def _write(self, db, batch):
+        if db is None:
+            self.dropped += len(batch)
+            return
+        try:
+            with db:
+                db.executemany(f"INSERT INTO answers ({', '.join(FIELDS)}) "
+                               f"VALUES ({', '.join('?' * len(FIELDS))})", batch)
+            self.written += len(batch)
+        except sqlite3.Error:
+            # Analytics must never take the game down; lose the batch instead
+            self.dropped += len(batch)
+
+
+def start_telemetry():
+    """A TelemetryWriter for this session, or None when NUMCRUNCH_TELEMETRY=0"""
+    target = os.environ.get('NUMCRUNCH_TELEMETRY', '1')
+    if target == '0':
+        return None
+    return TelemetryWriter(data_dir() / 'telemetry.sqlite3' if target == '1' else target)
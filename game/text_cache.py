@@ -0,0 +1,61 @@
+"""Bounded LRU cache for rendered text surfaces.
+
+Rendering text with pygame rasterizes the glyphs every call, which adds up
+when the grid, HUD and menus redraw the same strings 60 times a second.
+"""
+from collections import OrderedDict
+
+DEFAULT_MAX_SIZE = 256
+
+
+class TextCache:
+    """Caches ``font.render`` results keyed by (font, text, color)"""
+
+    def __init__(self, max_size=DEFAULT_MAX_SIZE):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._surfaces = OrderedDict()
+
+    def render(self, font, text, color, antialias=True):
+        key = (font, str(text), tuple(color), antialias)
+        surface = self._surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self._surfaces.move_to_end(key)
+            return surface
+
+        self.misses += 1
+        surface = font.render(key[1], antialias, color)
+        self._surfaces[key] = surface
+        if len(self._surfaces) > self.max_size:
+            self._surfaces.popitem(last=False)
+        return surface
+
+    def clear(self):
+        self._surfaces.clear()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._surfaces),
+            'max_size': self.max_size,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+    def __len__(self):
+        return len(self._surfaces)
+
+
+# Shared cache used by all of the game's text drawing
+text_cache = TextCache()
+
+
+def render_text(font, text, color, antialias=True):
+    return text_cache.render(font, text, color, antialias)
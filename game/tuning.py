@@ -0,0 +1,100 @@
+"""Difficulty-tuning harness.
+
+Plays thousands of seeded bot games per parameter set across every CPU
+core and reports survival time, score and answers per minute.
+
+Example::
+
+    python -m game.tuning --games 2000 --grid-size 5 7 --enemy-speed 1000 1500
+"""
+import argparse
+import itertools
+import json
+import os
+import statistics
+from concurrent.futures import ProcessPoolExecutor
+
+from game import core
+from game.autoplay import play_game, REACTION_MS
+
+CHUNK_SIZE = 50
+
+
+def _play_chunk(params, seeds, max_ms, reaction_ms):
+    return [play_game(params, seed, max_ms=max_ms, reaction_ms=reaction_ms) for seed in seeds]
+
+
+def summarize(results):
+    survival = [r['survival_ms'] for r in results]
+    minutes = sum(survival) / 60000
+    return {
+        'games': len(results),
+        'mean_survival_s': statistics.fmean(survival) / 1000,
+        'median_survival_s': statistics.median(survival) / 1000,
+        'mean_score': statistics.fmean(r['score'] for r in results),
+        'answers_per_minute': sum(r['correct'] for r in results) / minutes if minutes else 0.0,
+        'survived_pct': 100 * sum(r['survived'] for r in results) / len(results),
+    }
+
+
+def run_sweep(param_sets, games, workers=None, max_ms=10 * 60 * 1000,
+              reaction_ms=REACTION_MS, seed=0):
+    """Play ``games`` games for each parameter dict and summarize each set.
+
+    Every set uses the same seeds so results are comparable between sets.
+    """
+    seeds = list(range(seed, seed + games))
+    chunks = [seeds[i:i + CHUNK_SIZE] for i in range(0, games, CHUNK_SIZE)]
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        futures = [[pool.submit(_play_chunk, params, chunk, max_ms, reaction_ms)
+                    for chunk in chunks]
+                   for params in param_sets]
+        report = []
+        for params, set_futures in zip(param_sets, futures):
+            results = [r for future in set_futures for r in future.result()]
+            report.append({'params': params, **summarize(results)})
+    return report
+
+
+def parameter_grid(**options):
+    """Cartesian product of option lists, skipping options set to None"""
+    names = [name for name, values in options.items() if values is not None]
+    for combo in itertools.product(*(options[name] for name in names)):
+        yield dict(zip(names, combo))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tune NumCrunch difficulty with simulated play")
+    parser.add_argument('--games', type=int, default=1000, help="games per parameter set")
+    parser.add_argument('--grid-size', type=int, nargs='+', default=[core.GRID_SIZE])
+    parser.add_argument('--enemy-speed', type=int, nargs='+', default=[core.ENEMY_SPEED])
+    parser.add_argument('--distractor-range', type=int, nargs='+', default=[core.DISTRACTOR_RANGE])
+    parser.add_argument('--enemy-count', type=int, nargs='+', default=[1])
+    parser.add_argument('--wander-chance', type=float, nargs='+',
+                        help=f"use the wandering enemy (src/ uses {core.WANDER_CHANCE})")
+    parser.add_argument('--reaction-ms', type=int, default=REACTION_MS)
+    parser.add_argument('--max-seconds', type=int, default=600)
+    parser.add_argument('--workers', type=int, help="worker processes (default: all cores)")
+    parser.add_argument('--json', help="also write the report to this file")
+    args = parser.parse_args(argv)
+
+    param_sets = list(parameter_grid(grid_size=args.grid_size,
+                                     enemy_speed=args.enemy_speed,
+                                     distractor_range=args.distractor_range,
+                                     enemy_count=args.enemy_count,
+                                     wander_chance=args.wander_chance))
+    report = run_sweep(param_sets, args.games, workers=args.workers,
+                       max_ms=args.max_seconds * 1000, reaction_ms=args.reaction_ms)
+
+    for row in report:
+        params = ' '.join(f"{k}={v}" for k, v in row['params'].items())
+        print(f"{params}: survival {row['mean_survival_s']:.1f}s "
+              f"(median {row['median_survival_s']:.1f}s), score {row['mean_score']:.1f}, "
+              f"{row['answers_per_minute']:.1f} answers/min, {row['survived_pct']:.0f}% survived")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,16 @@
 #!/usr/bin/env python3
 from setuptools import setup, find_packages
+from setuptools.command.build_py import build_py
+
+
+class build_py_with_manifest(build_py):
+    """Regenerate game/assets/manifest.json before packaging the assets"""
+
+    def run(self):
+        from game.manifest import write_manifest
+        write_manifest()
+        super().run()
+
 
 setup(
     name="numcrunch-academy",
@@ -12,6 +23,10 @@ setup(
     },
     include_package_data=True,
     install_requires=['pygame>=2.0'],
+    extras_require={
+        'sim': ['numpy'],
+    },
+    cmdclass={'build_py': build_py_with_manifest},
     entry_points={
         'console_scripts': ['numcrunch=game.NumCrunch_Academy:main']
     }
@@ -3,13 +3,35 @@ import random
 import sys
 import os
 
-# Initialize pygame
+# Share the game package's helpers when run straight from the checkout
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from game.text_cache import render_text, text_cache
+from game.layers import GridLayer, solid_overlay
+from game.dirty_rects import DirtyRectRenderer, dirty_rects_enabled
+from game.display import ScaledDisplay, display_options
+from game.problem_bank import load_bank, format_problem
+from game.mastery import FactScheduler, load_profile, student_name
+from game.scores import mode_name, open_scores, range_start
+from game.distractors import generate_distractors
+from game.placement import place_answer, near_player
+from game.asset_cache import load_image
+from game.manifest import asset_digest, asset_file
+from game.async_assets import AsyncAssetLoader
+from game.sound_bank import SoundBank, init_mixer, MIXER_SETTINGS
+from game.scheduler import Scheduler
+from game.telemetry import start_telemetry
+from game.pacing import FramePacer, adaptive_pacing_enabled, pacing_report_enabled
+from game.profiler import profiler, profiling_enabled, OVERLAY_SIZE
+
+# Initialize pygame (the mixer uses the same settings as game/)
+pygame.mixer.pre_init(**MIXER_SETTINGS)
 pygame.init()
 
 # Constants
-WIDTH, HEIGHT = 800, 600
+WIDTH, HEIGHT = 800, 600  # logical size; the frame is scaled to the window
 GRID_SIZE = 5
 CELL_SIZE = 80
+TROGGLE_MOVE_RATE = 0.02 / (1000 / 60)  # moves per ms (was a 2% chance per 60 FPS frame)
 GRID_OFFSET_X = (WIDTH - GRID_SIZE * CELL_SIZE) // 2
 GRID_OFFSET_Y = (HEIGHT - GRID_SIZE * CELL_SIZE) // 2
 
@@ -23,117 +45,118 @@ YELLOW = (255, 255, 0)
 GRAY = (200, 200, 200)
 
 # Set up the display
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
+display = ScaledDisplay((WIDTH, HEIGHT), *display_options((WIDTH, HEIGHT)))  # NUMCRUNCH_WINDOW=1280x720
+screen = display.surface
 pygame.display.set_caption("NumCrunch Academy")
-clock = pygame.time.Clock()
+pacer = FramePacer(adaptive=adaptive_pacing_enabled())  # NUMCRUNCH_PACING=fixed
+renderer = DirtyRectRenderer(screen, enabled=dirty_rects_enabled(), output=display)  # NUMCRUNCH_DIRTY_RECTS=1
 font = pygame.font.SysFont('Arial', 32)
 small_font = pygame.font.SysFont('Arial', 24)
+debug_font = pygame.font.SysFont('Arial', 14)
+
+def load_sound(name, volume):
+    """Load a sound listed in the asset manifest, or None if it isn't shipped"""
+    with asset_file(name) as path:
+        if path is None:
+            return None
+        try:
+            sound = pygame.mixer.Sound(path)
+            sound.set_volume(volume)
+            print(f"Loaded {name} sound from: {path}")
+            return sound
+        except Exception as e:
+            print(f"Couldn't load {name} sound: {e}")
+            return None
 
-# Get the directory where this script is located
-SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+def load_sprite(name, size):
+    """Load an image listed in the asset manifest, or None if it isn't shipped"""
+    with asset_file(name) as path:
+        if path is None:
+            return None
+        try:
+            sprite = load_image(path, size, digest=asset_digest(name, path))
+            print(f"Loaded {name} from: {path}")
+            return sprite
+        except Exception as e:
+            print(f"Couldn't load {name}: {e}")
+            return None
 
-# Asset paths - now using relative paths
-ASSETS_DIR = os.path.join(SCRIPT_DIR, "assets")
-SPRITES_DIR = os.path.join(ASSETS_DIR, "sprites")
-SOUNDS_DIR = os.path.join(ASSETS_DIR, "sounds")
+def load_music():
+    """Load the background music listed in the asset manifest"""
+    with asset_file('music') as music_path:
+        if music_path is None:
+            return None
+        try:
+            pygame.mixer.music.load(music_path)
+            pygame.mixer.music.set_volume(0.4)
+            print(f"Loaded background music from: {music_path}")
+            return True
+        except Exception as e:
+            print(f"Couldn't load background music: {e}")
+            return None
 
-# Create directories if they don't exist
-os.makedirs(SPRITES_DIR, exist_ok=True)
-os.makedirs(SOUNDS_DIR, exist_ok=True)
+def set_asset(name):
+    """Callback for the loader that stores a finished asset in the global ``name``"""
+    def apply(value):
+        globals()[name] = value
+    return apply
+
+def music_loaded(_):
+    """Enable sound once the music is in and start it if a game is running"""
+    global sound_enabled
+    sound_enabled = True
+    if game_state == "playing":
+        pygame.mixer.music.play(-1)
 
-print(f"Looking for assets in: {ASSETS_DIR}")
+# Assets load in the background; the game starts right away with the
+# fallback shapes and swaps the real ones in as they finish
+loader = AsyncAssetLoader()
 
-# Sound setup - IMPROVED VERSION
+# Sound setup: effects play through a bank with reserved channels per
+# category and per-sound voice limits, so key mashing can't stack them
 sound_enabled = False
-crunch_sound = None
-victory_sound = None
+init_mixer()
+sound_bank = SoundBank()
 
-try:
-    pygame.mixer.init()
-    pygame.mixer.set_num_channels(8)  # Increase audio channels
-    
-    # Try loading crunch sound (multiple possible names)
-    for sound_file in ["crunch.wav", "munch.wav", "bite.wav"]:
-        sound_path = os.path.join(SOUNDS_DIR, sound_file)
-        if os.path.exists(sound_path):
-            try:
-                crunch_sound = pygame.mixer.Sound(sound_path)
-                crunch_sound.set_volume(0.7)  # Set appropriate volume
-                print(f"Loaded crunch sound from: {sound_path}")
-                break
-            except Exception as e:
-                print(f"Couldn't load {sound_file}: {e}")
-
-    # Try loading victory sound (multiple possible names and formats)
-    for sound_file in ["victory.flac", "success.wav", "win.flac", "celebration.wav"]:
-        sound_path = os.path.join(SOUNDS_DIR, sound_file)
-        if os.path.exists(sound_path):
-            try:
-                victory_sound = pygame.mixer.Sound(sound_path)
-                victory_sound.set_volume(0.7)
-                print(f"Loaded victory sound from: {sound_path}")
-                break
-            except Exception as e:
-                print(f"Couldn't load {sound_file}: {e}")
-
-    # Load background music
-    for music_file in ["background.wav", "background_music.wav", "music.mp3"]:
-        music_path = os.path.join(SOUNDS_DIR, music_file)
-        if os.path.exists(music_path):
-            try:
-                pygame.mixer.music.load(music_path)
-                pygame.mixer.music.set_volume(0.4)
-                sound_enabled = True
-                print(f"Loaded background music from: {music_path}")
-                break
-            except Exception as e:
-                print(f"Couldn't load {music_file}: {e}")
-
-except Exception as e:
-    print(f"Sound initialization failed: {e}")
-    sound_enabled = False
-
-# Load background
+if sound_bank.enabled:
+    loader.submit(load_sound, lambda sound: sound_bank.add('crunch', sound), 'crunch', 0.7)
+    loader.submit(load_sound, lambda sound: sound_bank.add('victory', sound), 'victory', 0.7)
+    loader.submit(load_music, music_loaded)
+else:
+    print("Sound initialization failed: no audio device")
+
+# Load images
 background = None
-background_files = ["background.png", "classroom.png"]
-for bg_file in background_files:
-    try:
-        bg_path = os.path.join(SPRITES_DIR, bg_file)
-        if os.path.exists(bg_path):
-            background = pygame.image.load(bg_path)
-            background = pygame.transform.scale(background, (WIDTH, HEIGHT))
-            print(f"Background loaded from: {bg_path}")
-            break
-    except Exception as e:
-        print(f"Couldn't load background: {e}")
-
-# Load player sprite
 player_sprite = None
-player_files = ["player.png", "cruncher.png"]
-for player_file in player_files:
-    try:
-        player_path = os.path.join(SPRITES_DIR, player_file)
-        if os.path.exists(player_path):
-            player_sprite = pygame.image.load(player_path)
-            player_sprite = pygame.transform.scale(player_sprite, (CELL_SIZE, CELL_SIZE))
-            print(f"Player sprite loaded from: {player_path}")
-            break
-    except Exception as e:
-        print(f"Couldn't load player sprite: {e}")
-
-# Load enemy sprite
 enemy_sprite = None
-enemy_files = ["enemy.png", "troublemaker.png"]
-for enemy_file in enemy_files:
-    try:
-        enemy_path = os.path.join(SPRITES_DIR, enemy_file)
-        if os.path.exists(enemy_path):
-            enemy_sprite = pygame.image.load(enemy_path)
-            enemy_sprite = pygame.transform.scale(enemy_sprite, (CELL_SIZE, CELL_SIZE))
-            print(f"Enemy sprite loaded from: {enemy_path}")
-            break
-    except Exception as e:
-        print(f"Couldn't load enemy sprite: {e}")
+loader.submit(load_sprite, set_asset('background'), 'background', (WIDTH, HEIGHT))
+loader.submit(load_sprite, set_asset('player_sprite'), 'player', (CELL_SIZE, CELL_SIZE))
+loader.submit(load_sprite, set_asset('enemy_sprite'), 'enemy', (CELL_SIZE, CELL_SIZE))
+
+# Background and grid baked into one layer, rebuilt only when the grid changes
+grid_layer = GridLayer(font, GRID_SIZE, CELL_SIZE, (GRID_OFFSET_X, GRID_OFFSET_Y),
+                       WHITE, BLACK, BLACK)
+
+# Profiling overlay (F3) and trace dump (F4); NUMCRUNCH_PROFILE=1 starts with it on
+overlay_rect = pygame.Rect((WIDTH - OVERLAY_SIZE[0] - 10, 90), OVERLAY_SIZE)
+profiler.watch('surfaces', lambda: text_cache.misses + grid_layer.rebuilds)
+profiler.hit_rate('text', lambda: text_cache.hits, lambda: text_cache.misses)
+profiler.hit_rate('grid', lambda: grid_layer.hits, lambda: grid_layer.rebuilds)
+profiler.watch('sounds', lambda: sound_bank.stats['played'])
+profiler.watch('sound skips', lambda: sound_bank.stats['cooldown'] + sound_bank.stats['voice_limit'])
+profiler.watch('voices cut', lambda: sound_bank.stats['stolen'])
+profiler.watch('underruns', lambda: sound_bank.stats['stalls'])
+if profiling_enabled():
+    profiler.toggle()
+
+# Every problem is pre-generated; drawing one is a single lookup
+problem_bank = load_bank()
+difficulty = None  # problem tier: 0 easy, 1 medium, 2 hard, None for all
+placement_policy = near_player  # see game.placement.PLACEMENT_POLICIES
+# Pick problems by the student's mastery (NUMCRUNCH_STUDENT, NUMCRUNCH_MASTERY=0 for random);
+# loaded when run as a script, so importing this module draws uniformly
+profile = None
+facts = None
 
 # Game variables
 player_pos = [2, 2]  # Start in the center
@@ -144,83 +167,56 @@ correct_answer = 0
 grid_values = []
 game_state = "playing"  # "playing", "game_over"
 troggle_pos = [random.randint(0, GRID_SIZE-1), random.randint(0, GRID_SIZE-1)]  # Enemy position
+scheduler = Scheduler()  # timed events, drained each frame
+problem_time = 0  # when the current problem appeared
+telemetry = None  # per-answer analytics, written off-thread; started when run as a script
+scores = None  # final scores, saved and queried off-thread; opened when run as a script
+SCORE_MODE = mode_name('mixed', GRID_SIZE)
+game_started = 0
+top_scores = None  # future of today's best games, shown on the game over screen
 
 def generate_problem():
-    """Generate a random math problem and its correct answer"""
-    problem_types = ["addition", "subtraction", "multiplication", "division"]
-    problem_type = random.choice(problem_types)
-    
-    if problem_type == "addition":
-        a = random.randint(1, 20)
-        b = random.randint(1, 20)
-        return f"{a} + {b}", a + b
-    elif problem_type == "subtraction":
-        a = random.randint(1, 20)
-        b = random.randint(1, a)  # Ensure no negative answers
-        return f"{a} - {b}", a - b
-    elif problem_type == "multiplication":
-        a = random.randint(1, 12)
-        b = random.randint(1, 12)
-        return f"{a} × {b}", a * b
-    elif problem_type == "division":
-        b = random.randint(1, 12)
-        answer = random.randint(1, 12)
-        a = b * answer
-        return f"{a} ÷ {b}", answer
+    """Pick the next math problem and its correct answer from the problem bank"""
+    if facts is not None:
+        operation, a, b, answer = facts.next(random)
+        return format_problem(operation, a, b), answer
+    return problem_bank.draw(random, tier=difficulty)
 
 def generate_grid():
     """Generate a grid with correct answer placed near the player"""
-    global grid_values, correct_answer, current_problem
+    global grid_values, correct_answer, current_problem, problem_time
     
     current_problem, correct_answer = generate_problem()
-    grid_values = []
-    
-    # Calculate distances from player position
-    distances = []
-    for row in range(GRID_SIZE):
-        for col in range(GRID_SIZE):
-            distance = abs(col - player_pos[0]) + abs(row - player_pos[1])  # Manhattan distance
-            distances.append((distance, row, col))
-    
-    # Sort positions by distance (closest first)
-    distances.sort()
+    problem_time = pygame.time.get_ticks()
     
     # Select one of the 3 closest positions for correct answer
-    closest_positions = distances[:3]
-    chosen_distance, correct_row, correct_col = random.choice(closest_positions)
+    correct_row, correct_col = place_answer(placement_policy, GRID_SIZE, random, player_pos)
     correct_pos = correct_row * GRID_SIZE + correct_col
     
-    # Fill the grid
-    for i in range(GRID_SIZE * GRID_SIZE):
-        if i == correct_pos:
-            grid_values.append(correct_answer)
-        else:
-            # Generate wrong answers that are somewhat close to the correct one
-            offset = random.randint(-3, 3)
-            while offset == 0:  # Ensure wrong answers are actually wrong
-                offset = random.randint(-3, 3)
-            wrong_answer = correct_answer + offset
-            grid_values.append(wrong_answer)
+    # Fill the grid with wrong answers that are somewhat close to the correct one
+    grid_values = generate_distractors(random, correct_answer, GRID_SIZE * GRID_SIZE - 1, spread=3)
+    grid_values.insert(correct_pos, correct_answer)
 
 def draw_grid():
-    """Draw the game grid with numbers"""
-    for row in range(GRID_SIZE):
-        for col in range(GRID_SIZE):
-            x = GRID_OFFSET_X + col * CELL_SIZE
-            y = GRID_OFFSET_Y + row * CELL_SIZE
-            
-            # Draw semi-transparent cell background
-            cell_surface = pygame.Surface((CELL_SIZE, CELL_SIZE), pygame.SRCALPHA)
-            cell_surface.fill(WHITE)
-            screen.blit(cell_surface, (x, y))
-            pygame.draw.rect(screen, BLACK, (x, y, CELL_SIZE, CELL_SIZE), 2)
-            
-            # Draw cell value
-            index = row * GRID_SIZE + col
-            value = grid_values[index]
-            text = font.render(str(value), True, BLACK)
-            text_rect = text.get_rect(center=(x + CELL_SIZE//2, y + CELL_SIZE//2))
-            screen.blit(text, text_rect)
+    """Draw the background and game grid with numbers"""
+    layer = grid_layer.get(background if background else GRAY, grid_values,
+                           correct_answer, screen.get_size())
+    screen.blit(layer, (0, 0))
+
+def cell_rect(pos):
+    """Screen rect of the grid cell at pos"""
+    return (GRID_OFFSET_X + pos[0] * CELL_SIZE, GRID_OFFSET_Y + pos[1] * CELL_SIZE,
+            CELL_SIZE, CELL_SIZE)
+
+def track_regions():
+    """Report what is on screen so the dirty-rect renderer can skip unchanged areas"""
+    renderer.track('screen', screen.get_rect(),
+                   (game_state, top_scores is not None and top_scores.done()))
+    renderer.track('grid', (GRID_OFFSET_X, GRID_OFFSET_Y, GRID_SIZE * CELL_SIZE, GRID_SIZE * CELL_SIZE),
+                   (tuple(grid_values), correct_answer))
+    renderer.track('player', cell_rect(player_pos), tuple(player_pos))
+    renderer.track('troggle', cell_rect(troggle_pos), tuple(troggle_pos))
+    renderer.track('hud', (0, 0, WIDTH, 80), (score, lives, current_problem))
 
 def draw_player():
     """Draw the player character using custom sprite or default"""
@@ -255,36 +251,40 @@ def draw_troggle():
 def draw_hud():
     """Draw the score, lives, and current problem"""
     # Create semi-transparent background for HUD
-    hud_bg = pygame.Surface((WIDTH, 80), pygame.SRCALPHA)
-    hud_bg.fill((200, 200, 200, 150))
-    screen.blit(hud_bg, (0, 0))
+    screen.blit(solid_overlay((WIDTH, 80), (200, 200, 200, 150)), (0, 0))
     
     # Score
-    score_text = small_font.render(f"Score: {score}", True, BLACK)
+    score_text = render_text(small_font, f"Score: {score}", BLACK)
     screen.blit(score_text, (20, 20))
     
     # Lives
-    lives_text = small_font.render(f"Lives: {lives}", True, BLACK)
+    lives_text = render_text(small_font, f"Lives: {lives}", BLACK)
     screen.blit(lives_text, (20, 50))
     
     # Current problem
-    problem_text = font.render(f"Find: {current_problem} = ?", True, BLUE)
+    problem_text = render_text(font, f"Find: {current_problem} = ?", BLUE)
     problem_rect = problem_text.get_rect(center=(WIDTH//2, 50))
     screen.blit(problem_text, problem_rect)
 
 def draw_game_over():
     """Draw the game over screen"""
-    overlay = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
-    overlay.fill((0, 0, 0, 180))
-    screen.blit(overlay, (0, 0))
+    screen.blit(solid_overlay((WIDTH, HEIGHT), (0, 0, 0, 180)), (0, 0))
     
-    game_over_text = font.render("GAME OVER", True, RED)
-    score_text = font.render(f"Final Score: {score}", True, WHITE)
-    restart_text = small_font.render("Press R to restart", True, WHITE)
+    game_over_text = render_text(font, "GAME OVER", RED)
+    score_text = render_text(font, f"Final Score: {score}", WHITE)
+    restart_text = render_text(small_font, "Press R to restart", WHITE)
     
     screen.blit(game_over_text, (WIDTH//2 - game_over_text.get_width()//2, HEIGHT//2 - 50))
     screen.blit(score_text, (WIDTH//2 - score_text.get_width()//2, HEIGHT//2))
     screen.blit(restart_text, (WIDTH//2 - restart_text.get_width()//2, HEIGHT//2 + 50))
+    
+    # Today's best, once the score store has answered
+    if top_scores is not None and top_scores.done() and top_scores.exception() is None:
+        y = HEIGHT//2 + 100
+        for rank, (student, best, _) in enumerate(top_scores.result(), 1):
+            line = render_text(small_font, f"{rank}. {student}  {best}", WHITE)
+            screen.blit(line, (WIDTH//2 - line.get_width()//2, y))
+            y += line.get_height()
 
 def check_answer():
     """Check if the player is on the correct answer"""
@@ -293,49 +293,78 @@ def check_answer():
     index = player_pos[1] * GRID_SIZE + player_pos[0]
     if grid_values[index] == correct_answer:
         score += 10
+        log_answer(grid_values[index])
         
-        # Play crunch sound if available - UPDATED
-        if sound_enabled and crunch_sound:
-            try:
-                crunch_sound.play()
-            except Exception as e:
-                print(f"Couldn't play crunch sound: {e}")
+        # Play crunch sound if available
+        if sound_enabled:
+            sound_bank.play('crunch')
         
         generate_grid()
         
-        # Play victory sound every 50 points if available - UPDATED
-        if score % 50 == 0 and sound_enabled and victory_sound:
-            try:
-                victory_sound.play()
-            except Exception as e:
-                print(f"Couldn't play victory sound: {e}")
+        # Play victory sound every 50 points if available
+        if score % 50 == 0 and sound_enabled:
+            sound_bank.play('victory')
     else:
         lives -= 1
+        log_answer(grid_values[index])
         if lives <= 0:
-            global game_state
-            game_state = "game_over"
+            end_game()
+
+def end_game():
+    """Stop play, save the final score and fetch today's best to show with it"""
+    global game_state, top_scores
+    game_state = "game_over"
+    if scores is not None:
+        scores.add(student_name(), SCORE_MODE, difficulty, score, pygame.time.get_ticks() - game_started)
+        scores.flush()
+        top_scores = scores.top(SCORE_MODE, difficulty, range_start(0), limit=3)
+
+def schedule_troggle(now):
+    """Queue the enemy's next random move; gaps are exponential so the
+    average pace is the same at any frame rate"""
+    scheduler.schedule(now + random.expovariate(TROGGLE_MOVE_RATE), move_troggle)
+
+def log_answer(chosen):
+    """Update the student's mastery and queue telemetry for the answer just picked"""
+    now = pygame.time.get_ticks()
+    if facts is not None:
+        facts.answer(chosen == correct_answer, now - problem_time)
+    if telemetry is None:
+        return
+    telemetry.log({
+        'at': now,
+        'problem': current_problem,
+        'answer': correct_answer,
+        'chosen': chosen,
+        'correct': chosen == correct_answer,
+        'latency_ms': now - problem_time,
+        'lives': lives,
+        'score': score,
+        'enemy_distance': abs(troggle_pos[0] - player_pos[0]) + abs(troggle_pos[1] - player_pos[1]),
+    })
 
-def move_troggle():
+def move_troggle(now):
     """Move the enemy randomly"""
-    if random.random() < 0.02:  # 2% chance per frame to move
-        direction = random.choice(["left", "right", "up", "down"])
-        if direction == "left" and troggle_pos[0] > 0:
-            troggle_pos[0] -= 1
-        elif direction == "right" and troggle_pos[0] < GRID_SIZE-1:
-            troggle_pos[0] += 1
-        elif direction == "up" and troggle_pos[1] > 0:
-            troggle_pos[1] -= 1
-        elif direction == "down" and troggle_pos[1] < GRID_SIZE-1:
-            troggle_pos[1] += 1
+    schedule_troggle(now)
+    direction = random.choice(["left", "right", "up", "down"])
+    if direction == "left" and troggle_pos[0] > 0:
+        troggle_pos[0] -= 1
+    elif direction == "right" and troggle_pos[0] < GRID_SIZE-1:
+        troggle_pos[0] += 1
+    elif direction == "up" and troggle_pos[1] > 0:
+        troggle_pos[1] -= 1
+    elif direction == "down" and troggle_pos[1] < GRID_SIZE-1:
+        troggle_pos[1] += 1
+    check_troggle_collision()
 
 def check_troggle_collision():
     """Check if player collides with enemy"""
-    global lives, game_state
+    global lives
     
     if player_pos == troggle_pos and game_state == "playing":
         lives -= 1
         if lives <= 0:
-            game_state = "game_over"
+            end_game()
         else:
             # Respawn troggle away from player
             troggle_pos[0] = random.randint(0, GRID_SIZE-1)
@@ -346,79 +375,135 @@ def check_troggle_collision():
 
 # Initialize the game
 generate_grid()
+game_started = pygame.time.get_ticks()
+schedule_troggle(pygame.time.get_ticks())
 
-# Start background music
-if sound_enabled:
-    pygame.mixer.music.play(-1)
+# Run the game when started as a script (tools such as game.benchmark import it)
+if __name__ == '__main__':
+    # Answers, scores and mastery are only kept for a game someone is playing
+    telemetry = start_telemetry()
+    scores = open_scores()
+    profile = load_profile()
+    if profile is not None:
+        facts = FactScheduler(profile, problem_bank, tier=difficulty)
+        generate_grid()  # the first problem comes from the profile too
 
-# Main game loop
-running = True
-while running:
-    # Draw background first
-    if background:
-        screen.blit(background, (0, 0))
-    else:
-        screen.fill(GRAY)
-    
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
+    # Start background music
+    if sound_enabled:
+        pygame.mixer.music.play(-1)
+
+    # Main game loop
+    running = True
+    while running:
+        profiler.begin_frame()
+        # The game over screen is static once assets have loaded
+        busy = (game_state == "playing" or not loader.done
+                or (top_scores is not None and not top_scores.done()))
+        events = pacer.events(busy)
+        profiler.mark('wait')
+        for event in events:
+            if event.type == pygame.QUIT:
+                running = False
         
-        if game_state == "playing":
-            if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_LEFT and player_pos[0] > 0:
-                    player_pos[0] -= 1
-                    check_answer()
-                    check_troggle_collision()
-                elif event.key == pygame.K_RIGHT and player_pos[0] < GRID_SIZE - 1:
-                    player_pos[0] += 1
-                    check_answer()
-                    check_troggle_collision()
-                elif event.key == pygame.K_UP and player_pos[1] > 0:
-                    player_pos[1] -= 1
-                    check_answer()
-                    check_troggle_collision()
-                elif event.key == pygame.K_DOWN and player_pos[1] < GRID_SIZE - 1:
-                    player_pos[1] += 1
-                    check_answer()
-                    check_troggle_collision()
-                elif event.key == pygame.K_m:  # M key toggles music
+            if event.type == pygame.VIDEORESIZE:
+                display.resize()
+                screen = renderer.screen = display.surface
+            if event.type in (pygame.VIDEOEXPOSE, pygame.VIDEORESIZE):
+                renderer.mark_full()
+        
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:  # F3 toggles the profiler overlay
+                profiler.toggle()
+                renderer.mark_full()
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F4:  # F4 dumps a profile trace
+                print(f"Wrote profile trace {profiler.dump()}")
+        
+            if game_state == "playing":
+                if event.type == pygame.KEYDOWN:
+                    if event.key == pygame.K_LEFT and player_pos[0] > 0:
+                        player_pos[0] -= 1
+                        check_answer()
+                        check_troggle_collision()
+                    elif event.key == pygame.K_RIGHT and player_pos[0] < GRID_SIZE - 1:
+                        player_pos[0] += 1
+                        check_answer()
+                        check_troggle_collision()
+                    elif event.key == pygame.K_UP and player_pos[1] > 0:
+                        player_pos[1] -= 1
+                        check_answer()
+                        check_troggle_collision()
+                    elif event.key == pygame.K_DOWN and player_pos[1] < GRID_SIZE - 1:
+                        player_pos[1] += 1
+                        check_answer()
+                        check_troggle_collision()
+                    elif event.key == pygame.K_m:  # M key toggles music
+                        if sound_enabled:
+                            if pygame.mixer.music.get_busy():
+                                pygame.mixer.music.pause()
+                            else:
+                                pygame.mixer.music.unpause()
+            elif game_state == "game_over":
+                if event.type == pygame.KEYDOWN and event.key == pygame.K_r:
+                    # Reset the game
+                    player_pos = [2, 2]
+                    troggle_pos = [random.randint(0, GRID_SIZE-1), random.randint(0, GRID_SIZE-1)]
+                    score = 0
+                    lives = 3
+                    game_state = "playing"
+                    generate_grid()
+                    game_started = pygame.time.get_ticks()
+                    scheduler.clear()
+                    schedule_troggle(pygame.time.get_ticks())
                     if sound_enabled:
-                        if pygame.mixer.music.get_busy():
-                            pygame.mixer.music.pause()
-                        else:
-                            pygame.mixer.music.unpause()
-        elif game_state == "game_over":
-            if event.type == pygame.KEYDOWN and event.key == pygame.K_r:
-                # Reset the game
-                player_pos = [2, 2]
-                troggle_pos = [random.randint(0, GRID_SIZE-1), random.randint(0, GRID_SIZE-1)]
-                score = 0
-                lives = 3
-                game_state = "playing"
-                generate_grid()
-                if sound_enabled:
-                    pygame.mixer.music.play(-1)
+                        pygame.mixer.music.play(-1)
+        profiler.mark('events')
     
-    # Game logic
-    if game_state == "playing":
-        move_troggle()
-        check_troggle_collision()
+        sound_bank.tick(None if pacer.idle else pygame.time.get_ticks())
     
-    # Drawing
-    draw_grid()
-    draw_player()
-    draw_troggle()
-    draw_hud()
+        # Swap in assets that finished loading in the background
+        if loader.poll():
+            renderer.mark_full()
     
-    if game_state == "game_over":
-        draw_game_over()
+        # Game logic
+        if game_state == "playing":
+            scheduler.run_due(pygame.time.get_ticks())
+        profiler.mark('logic')
     
-    pygame.display.flip()
-    clock.tick(60)
-
-# Clean up
-pygame.quit()
-if sound_enabled:
-    pygame.mixer.quit()
-sys.exit()
\ No newline at end of file
+        # Drawing
+        track_regions()
+        if profiler.enabled:
+            renderer.mark(overlay_rect)
+        if renderer.begin_frame():
+            draw_grid()
+            profiler.mark('draw_grid')
+            draw_player()
+            profiler.mark('draw_player')
+            draw_troggle()
+            profiler.mark('draw_troggle')
+            draw_hud()
+            profiler.mark('draw_hud')
+        
+            if game_state == "game_over":
+                draw_game_over()
+                profiler.mark('draw_game_over')
+        
+            if profiler.enabled:
+                profiler.draw(screen, debug_font, overlay_rect.topleft)
+                profiler.mark('overlay')
+            renderer.present()
+            profiler.mark('present')
+        profiler.end_frame()
+
+    # Clean up
+    if telemetry:
+        telemetry.close()
+    if profile is not None:
+        profile.save()
+    if scores is not None:
+        scores.close()
+    if pacing_report_enabled():
+        print(pacer.report())
+        print(sound_bank.report())
+    pygame.quit()
+    if sound_enabled:
+        pygame.mixer.quit()
+    sys.exit()